@@ -3,6 +3,7 @@ import tkinter as tk
 from copy import deepcopy
 from validator import validate_unique, validate_chars
 import save_handler as saves
+from sort_preview import SortPreview
 
 class HallManager():
     '''
@@ -26,7 +27,9 @@ class HallManager():
         self.halls = saves.get_saves()
         self.modified_version = deepcopy(self.halls)
         self.new_hall_adder = NewHallAdder(self)
+        self.preview = PreviewPane(self)
         self.curr_hall_table = HallTable(self)
+        self.preview.refresh()
 
     def start(self):
         '''
@@ -130,6 +133,7 @@ class NewHallAdder():
         self.dir_entry.delete(0, len(self.dir_entry.get()))
         self.result_label.config(text=f"{new_name} has been added to your Halls!", bg='lightgreen')
         self.master.curr_hall_table.render_new(new_name, [new_key, new_dirname])
+        self.master.preview.schedule()
         self.name_entry.focus_set()
 
 class HallTable():
@@ -299,6 +303,75 @@ class HallTable():
             saves.post_saves(self.master.halls)
             self.render_save("Saved!", 'lightgreen')
 
+class PreviewPane():
+    '''
+    This class provides a tk.Frame previewing how the files in
+    the selected input folder would be sorted with the key
+    phrases currently typed into the HallTable, including the
+    number of files per hall and the files with no hall.
+    '''
+    def __init__(self, master, delay=300):
+        '''
+        Parameters:
+            - master: HallManager
+                The parent HallManager object containing the
+                Tk that this PreviewPane's frame is placed in.
+            - delay: int
+                The number of milliseconds to wait after the
+                last key press before updating the preview.
+        '''
+        self.master = master
+        self.delay = delay
+        self.job = None
+        self.frame = tk.Frame(master.window, bd=7, relief="ridge")
+        self.frame.grid(row=2, column=0, sticky="we")
+
+        self.title = tk.Label(self.frame, text="Sort Preview", bd=5, relief="groove", padx=5, pady=5, bg='lightblue', width=55)
+        self.title.grid(row=0, column=0, sticky="ew")
+
+        self.counts = tk.Listbox(self.frame, height=6)
+        self.counts.grid(row=1, column=0, sticky="ew")
+        self.unmatched_label = tk.Label(self.frame, anchor="w")
+        self.unmatched_label.grid(row=2, column=0, sticky="ew")
+        self.unmatched = tk.Listbox(self.frame, height=6)
+        self.unmatched.grid(row=3, column=0, sticky="ew")
+
+        self.preview = None
+        source = master.master.source
+        if source:
+            self.preview = SortPreview([filename for filename in os.listdir(source) if filename.endswith(".pdf")])
+        else:
+            self.unmatched_label.config(text="Choose an input folder to preview the sort!", bg='yellow')
+
+    def schedule(self, event=None):
+        '''
+        This function updates the preview once no key has been
+        pressed for the delay, so typing stays responsive.
+        '''
+        if self.job:
+            self.master.window.after_cancel(self.job)
+        self.job = self.master.window.after(self.delay, self.refresh)
+
+    def refresh(self):
+        '''
+        This function updates the preview with the key phrases
+        currently typed into the HallTable.
+        '''
+        self.job = None
+        if not self.preview:
+            return
+        rows = self.master.curr_hall_table.rows
+        self.preview.update([row.key.get().strip() for row in rows])
+        counts = self.preview.get_counts()
+        self.counts.delete(0, tk.END)
+        for row in rows:
+            key = row.key.get().strip()
+            self.counts.insert(tk.END, f"{row.hall_entry} ({key}): {counts.get(key, 0)} files")
+        unmatched = self.preview.get_unmatched()
+        self.unmatched_label.config(text=f"Dining Hall Not Found: {len(unmatched)} files", bg='lightgreen' if not unmatched else 'yellow')
+        self.unmatched.delete(0, tk.END)
+        self.unmatched.insert(tk.END, *unmatched[:500])
+
 class HallRow():
     '''
     This class provides individual rows for the HallTable.
@@ -332,6 +405,7 @@ class HallRow():
         self.key = tk.Entry(self.frame, bd=5)
         self.key.insert(0, row_keypair[0])
         self.key.grid(row=0, column=1)
+        self.key.bind("<KeyRelease>", master.master.preview.schedule)
         self.dir = tk.Entry(self.frame, bd=5)
         self.dir.insert(0, row_keypair[1])
         self.dir.grid(row=0, column=2)
@@ -352,6 +426,7 @@ class HallRow():
         self.frame.destroy()
         if len(self.master.rows) == 0:
             self.master.render_empty()
+        self.master.master.preview.schedule()
 
     def grid(self, row, column):
         '''
@@ -0,0 +1,148 @@
+import os
+import tkinter as tk
+import save_handler as saves
+from job_queue import new_job
+
+class JobQueue():
+    '''
+    This class provides a tk.Toplevel widget allowing users to
+    queue several sorts, each with its own input and output
+    folder, and to watch the progress of each one.
+    '''
+    def __init__(self, master):
+        '''
+        Parameters:
+            - master: Organizer
+                The main Organizer containing the folder
+                selection window and the JobScheduler.
+        '''
+        self.master = master
+        self.scheduler = master.scheduler
+        self.window = tk.Toplevel(master.window)
+        self.window.title("Job Queue")
+        self.window.resizable(False, False)
+
+        self.add_frame = tk.Frame(self.window, bd=7, relief="ridge")
+        self.add_frame.grid(row=0, column=0, sticky="we")
+        self.add_title = tk.Label(self.add_frame, text="Add the Selected Folders as a Job!", bd=5, relief="groove", padx=5, pady=5, bg='lightblue')
+        self.add_title.grid(row=0, column=0, columnspan=4, sticky="we")
+        self.surveys = tk.BooleanVar()
+        self.surveys.set(True)
+        self.surveys_check = tk.Checkbutton(self.add_frame, text="Fetch Surveys", variable=self.surveys, onvalue=True, offvalue=False)
+        self.surveys_check.grid(row=1, column=0)
+        self.priority_label = tk.Label(self.add_frame, text="Priority")
+        self.priority_label.grid(row=1, column=1)
+        self.priority_entry = tk.Entry(self.add_frame, bg='white', bd=5, width=5)
+        self.priority_entry.insert(0, "0")
+        self.priority_entry.grid(row=1, column=2)
+        self.add_button = tk.Button(self.add_frame, text="Add", bg='white', padx=4, pady=2, command=self.add)
+        self.add_button.grid(row=1, column=3, sticky="we")
+
+        self.list_frame = tk.Frame(self.window, bd=7, relief="ridge")
+        self.list_frame.grid(row=1, column=0, sticky="we")
+        self.list_title = tk.Label(self.list_frame, text="Current Jobs", bd=5, relief="groove", padx=5, pady=5, bg='lightblue')
+        self.list_title.grid(row=0, column=0, columnspan=4, sticky="we")
+        self.job_list = tk.Listbox(self.list_frame, width=110, height=10)
+        self.job_list.grid(row=1, column=0, columnspan=4, sticky="we")
+        self.raise_button = tk.Button(self.list_frame, text="Raise Priority", bg='white', command=lambda: self.change_priority(1))
+        self.raise_button.grid(row=2, column=0, sticky="we")
+        self.lower_button = tk.Button(self.list_frame, text="Lower Priority", bg='white', command=lambda: self.change_priority(-1))
+        self.lower_button.grid(row=2, column=1, sticky="we")
+        self.remove_button = tk.Button(self.list_frame, text="Remove", bg='white', command=self.remove)
+        self.remove_button.grid(row=2, column=2, sticky="we")
+        self.start_button = tk.Button(self.list_frame, text="Start Jobs", bg='white', command=self.master.start_jobs)
+        self.start_button.grid(row=2, column=3, sticky="we")
+        self.result_label = tk.Label(self.list_frame)
+        self.result_label.grid(row=3, column=0, columnspan=4, sticky="we")
+
+        self.shown_jobs = []
+        self.refresh()
+
+    def add(self):
+        '''
+        The action taken when the add button is clicked.
+
+        Checks the following errors in the order listed:
+        1. No input folder is selected.
+        2. No output folder is selected.
+        3. The priority is not a whole number.
+
+        If no errors are found, the selected folders are queued
+        with the current hall settings and Settings menu options.
+        '''
+        if not self.master.source:
+            self.result_label.config(text="No input folder selected!", bg='red')
+            return
+        if not self.master.dest:
+            self.result_label.config(text="No output folder selected!", bg='red')
+            return
+        try:
+            priority = int(self.priority_entry.get().strip())
+        except ValueError:
+            self.result_label.config(text="Priority must be a whole number!", bg='red')
+            return
+        options = {
+            "all_folders": self.master.all_folders.get(),
+            "log": self.master.log.get(),
+            "surveys": self.surveys.get()
+        }
+        self.scheduler.add(new_job(self.master.source, self.master.dest, saves.get_saves(), options, priority))
+        self.result_label.config(text=f"{os.path.basename(self.master.source)} has been added to your Jobs!", bg='lightgreen')
+        self.refresh()
+
+    def _get_selected(self):
+        '''
+        This function returns the selected job, or None if no
+        job is selected.
+        '''
+        selection = self.job_list.curselection()
+        if not selection:
+            self.result_label.config(text="No job selected!", bg='red')
+            return None
+        return self.shown_jobs[selection[0]]
+
+    def change_priority(self, change):
+        '''
+        This function changes the priority of the selected job.
+
+        Parameters:
+            - change: int
+                The amount to add to the job's priority.
+        '''
+        job = self._get_selected()
+        if job:
+            self.scheduler.set_priority(job["id"], job["priority"] + change)
+            self.refresh()
+
+    def remove(self):
+        '''
+        This function removes the selected job from the queue,
+        unless it is running.
+        '''
+        job = self._get_selected()
+        if not job:
+            return
+        if self.scheduler.remove(job["id"]):
+            self.result_label.config(text="Job removed!", bg='lightgreen')
+        else:
+            self.result_label.config(text="Running jobs cannot be removed!", bg='red')
+        self.refresh()
+
+    def refresh(self):
+        '''
+        This function redraws the list of jobs, and schedules
+        itself to run again while the window is open.
+        '''
+        if not self.window.winfo_exists():
+            return
+        selection = self.job_list.curselection()
+        selected_id = self.shown_jobs[selection[0]]["id"] if selection else None
+        self.shown_jobs = sorted(self.scheduler.jobs, key=lambda job: -job["priority"])
+        self.job_list.delete(0, tk.END)
+        for idx, job in enumerate(self.shown_jobs):
+            kind = "surveys" if job["options"]["surveys"] else "local"
+            progress = self.scheduler.get_progress(job)
+            self.job_list.insert(tk.END, f"[{job['priority']}] {job['status']} ({kind}): {job['source']} -> {job['dest']} {progress}")
+            if job["id"] == selected_id:
+                self.job_list.selection_set(idx)
+        self.window.after(500, self.refresh)
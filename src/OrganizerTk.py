@@ -1,13 +1,21 @@
-import os, json, tempfile
+import os, json, tempfile, time
 import re
 import tkinter as tk
 from tkinter.filedialog import askdirectory
-from playwright.sync_api import sync_playwright
 import playwright_funcs as pwfuncs
 import pandas as pd
 from datetime import datetime as dt
 from HallManagerTk import HallManager
+from JobQueueTk import JobQueue
+from job_queue import JobScheduler
+from sort_pipeline import SortPipeline, get_sort_details
 import save_handler as saves
+import retry_queue as retry
+import exporter
+import verifier
+from claims import ClaimManager
+from rate_control import RateController
+import metrics
 
 class Organizer():
     '''
@@ -18,6 +26,12 @@ class Organizer():
     def __init__(self):
         self.source = None
         self.dest = None
+        self.sorting = False
+        self.retry_job = None
+        self.rate_controller = RateController()
+        self.scheduler = JobScheduler(self.rate_controller, self._finish_job)
+        self.jobs_job = None
+        self.job_cookies = None
 
         self.window = tk.Tk()
         self.window.title("File Organizer")
@@ -32,6 +46,22 @@ class Organizer():
         self.log = tk.BooleanVar()
         self.log.set(True)
 
+        self.export = tk.BooleanVar()
+        self.export.set(False)
+
+        self.shared = tk.BooleanVar()
+        self.shared.set(False)
+
+        self.serve_metrics = tk.BooleanVar()
+        self.serve_metrics.set(False)
+
+        self.export_latest = tk.BooleanVar()
+        self.export_latest.set(True)
+
+        self.verify = tk.BooleanVar()
+        self.verify.set(True)
+        self.last_run = None
+
         self._get_menu()
 
         self.source_btn = self._get_button("Choose Input Folder", self.set_source, 0, 0)
@@ -44,6 +74,7 @@ class Organizer():
 
         self.status = tk.Label(self.frame, text="No folders selected!", bg='red')
         self.status.grid(row=2, column=1)
+        self._schedule_retry()
 
     def _get_menu(self):
         '''
@@ -53,6 +84,9 @@ class Organizer():
         menubar = tk.Menu(self.window)
         self.window.config(menu=menubar)
         self._get_settings_menu(menubar)
+        self._get_surveys_menu(menubar)
+        self._get_export_menu(menubar)
+        self._get_jobs_menu(menubar)
         self._get_info_menu(menubar)
     
     def _get_settings_menu(self, menubar):
@@ -66,11 +100,81 @@ class Organizer():
         '''
         settings_menu = tk.Menu(menubar, tearoff=0)
         settings_menu.add_command(label="Dining Hall Settings", command=self._open_hall_settings)
+        settings_menu.add_command(label="Verify Output Folder", command=self.verify_output)
+        settings_menu.add_command(label="Accept Current Checksums", command=self.accept_checksums)
         settings_menu.add_separator()
         settings_menu.add_checkbutton(label="Create All Folders", onvalue=True, offvalue=False, variable=self.all_folders)
         settings_menu.add_checkbutton(label="Create Log File", onvalue=True, offvalue=False, variable=self.log)
+        settings_menu.add_checkbutton(label="Verify After Sorting", onvalue=True, offvalue=False, variable=self.verify)
+        settings_menu.add_checkbutton(label="Share Input Folder", onvalue=True, offvalue=False, variable=self.shared)
+        settings_menu.add_checkbutton(label="Serve Metrics", onvalue=True, offvalue=False, variable=self.serve_metrics, command=self._toggle_metrics)
         menubar.add_cascade(label="Settings", menu=settings_menu)
 
+    def _get_surveys_menu(self, menubar):
+        '''
+        This function adds the Surveys submenu to
+        the main menubar.
+
+        Parameters:
+            - menubar: tk.Menu
+                The main menubar.
+        '''
+        surveys_menu = tk.Menu(menubar, tearoff=0)
+        surveys_menu.add_command(label="Fetch Missing Surveys", command=self.fetch_missing_surveys)
+        menubar.add_cascade(label="Surveys", menu=surveys_menu)
+
+    def _get_export_menu(self, menubar):
+        '''
+        This function adds the Export submenu to
+        the main menubar.
+
+        Parameters:
+            - menubar: tk.Menu
+                The main menubar.
+        '''
+        export_menu = tk.Menu(menubar, tearoff=0)
+        export_menu.add_command(label="Export Halls Now", command=self.export_halls)
+        export_menu.add_separator()
+        export_menu.add_checkbutton(label="Export After Sorting", onvalue=True, offvalue=False, variable=self.export)
+        export_menu.add_checkbutton(label="Latest Run Only", onvalue=True, offvalue=False, variable=self.export_latest)
+        menubar.add_cascade(label="Export", menu=export_menu)
+
+    def _toggle_metrics(self):
+        '''
+        This function starts or stops the metrics server,
+        following the "Serve Metrics" setting.
+        '''
+        if not self.serve_metrics.get():
+            metrics.stop_server()
+            return
+        try:
+            metrics.start_server()
+            self.status.config(text=f"Serving metrics on port {metrics.default_port}!", bg='lightgreen')
+        except OSError:
+            self.serve_metrics.set(False)
+            self.status.config(text=f"Port {metrics.default_port} is already in use!", bg='red')
+
+    def _get_jobs_menu(self, menubar):
+        '''
+        This function adds the Jobs submenu to
+        the main menubar.
+
+        Parameters:
+            - menubar: tk.Menu
+                The main menubar.
+        '''
+        jobs_menu = tk.Menu(menubar, tearoff=0)
+        jobs_menu.add_command(label="Job Queue", command=self._open_job_queue)
+        jobs_menu.add_command(label="Start Jobs", command=self.start_jobs)
+        menubar.add_cascade(label="Jobs", menu=jobs_menu)
+
+    def _open_job_queue(self):
+        '''
+        This function opens a JobQueue to allow the user
+        to queue and watch several sorts.
+        '''
+        JobQueue(self)
+
     def _open_hall_settings(self):
         '''
         This function opens a HallManager to allow the
@@ -98,9 +202,12 @@ class Organizer():
         regarding how to use this application.
         '''
         message = """
-            Welcome to the Help page! Please ensure that you
-            have an internet connection before using this app,
-            as the app is unusable otherwise.
+            Welcome to the Help page! An internet connection is
+            needed to download the Scheduling Surveys. Files are
+            still sorted without one, and any survey that could
+            not be downloaded is queued. Queued surveys are retried
+            automatically, or you can select "Fetch Missing Surveys"
+            under the Surveys menu to retry them right away.
 
             To use this application, you must choose the input
             folder (where all of your DocuSign PDFs are located)
@@ -115,7 +222,11 @@ class Organizer():
             You can change the key phrases used to identify the
             dining halls under the Settings menu, where you can
             select "Dining Hall Settings" to open a new window
-            that will allow you to modify your settings.
+            that will allow you to modify your settings. If an
+            input folder is selected, the "Sort Preview" at the
+            bottom of that window shows how many files would go
+            to each hall with the key phrases you have typed, and
+            which files would have no hall.
 
             By default, only the necessary folders will be made,
             i.e. if there are no applicants for a dining hall,
@@ -131,6 +242,52 @@ class Organizer():
             in your output folder. If no Scheduling Survey number
             was provided, "-1" will be placed in the log file.
 
+            If an applicant's name matches an existing folder
+            apart from casing, spacing or punctuation, their
+            files are placed in the existing folder. Names that
+            are only similar to an existing folder are listed
+            under the "Possible Duplicate Names" sheet of the
+            log file for you to check.
+
+            "Verify After Sorting" is on by default. After each
+            sort, every PDF in the applicant folders it produced
+            is checked for being empty or cut short, and a list
+            of their SHA-256 checksums is saved in the "Manifests"
+            folder of your output folder. Files that fail are
+            listed under the "Failed Verification" sheet of the
+            log file. Select "Verify Output Folder" under the
+            Settings menu to check the files in every manifest
+            again, such as after copying the output folder. Any
+            file changed since its manifest was written is
+            reported as "Checksum changed". If you replaced such
+            a file on purpose, select "Accept Current Checksums"
+            under the Settings menu to check every file against
+            its current contents from then on.
+
+            If several computers sort the same input folder at
+            once, check "Share Input Folder" under the Settings
+            menu on every computer. Each file is then sorted by
+            only one computer, and every computer writes the same
+            log file covering the whole run.
+
+            To watch a sort from another computer, check "Serve
+            Metrics" under the Settings menu. The sort's progress
+            can then be read in the Prometheus format at
+            http://(this computer):9464/metrics.
+
+            To sort several input folders, select each pair of
+            input and output folders in turn and add them under
+            Jobs > Job Queue, then click "Start Jobs". Jobs with a
+            higher priority start first, and several jobs can run
+            at once. Queued jobs are kept when the app is closed.
+
+            Under the Export menu, "Export Halls Now" zips each
+            hall folder into its own zip file, placed in the
+            "Exports" folder of your output folder. Check "Export
+            After Sorting" to do this after every sort, and "Latest
+            Run Only" to only include the applicants from the last
+            sort.
+
             Happy Sorting!
         """
         tk.messagebox.showinfo(title="How to Use", message=message)
@@ -278,82 +435,423 @@ class Organizer():
         '''
         This function starts the sorting process for all
         the files in the selected input folder.
+
+        Files are parsed, moved, and their Scheduling Surveys
+        fetched at the same time by a SortPipeline, so moving
+        files never waits on the network. The login window is
+        shown while the files are being moved. Any survey that
+        cannot be fetched is added to the retry queue.
+
+        If "Share Input Folder" is checked, each file is claimed
+        before it is moved, so that several workstations can sort
+        the same input folder at once.
+
+        Nothing is done if a sort, survey fetch or job is already
+        running, and the Sort button is disabled until the sort
+        has finished.
         '''
-        self.status.config(text="Checking for network connectivity...", bg='yellow')
+        if self.sorting:
+            return
+        if self.jobs_job:
+            self.status.config(text="Wait for the running jobs to finish before sorting!", bg='red')
+            return
+        self.sorting = True
+        self.sort_btn.config(state=tk.DISABLED)
+        try:
+            self._sort()
+        finally:
+            self.sorting = False
+            self.sort_btn.config(state=tk.NORMAL)
+            self._schedule_retry()
+
+    def _sort(self):
+        '''
+        This function runs a sort for the sort method, which
+        takes care of the sorting flag.
+        '''
+        keys, dirs = self._load_halls()
+        pdf_files = [filename for filename in os.listdir(self.source) if filename.endswith(".pdf")]
+        needs_login = any([len(self._get_sort_details(filename, keys)) == 3 for filename in pdf_files])
+        self.status.config(text="Sorting...", bg='yellow')
         self.window.update()
-        if pwfuncs.check_connection():
-            self.status.config(text="Connected!", bg='lightgreen')
-            self.window.update()
+        claims = None
+        if self.shared.get():
+            claims = ClaimManager(self.source)
+            claims.start()
+        try:
+            if self.all_folders.get():
+                for dir in dirs:
+                    os.makedirs(os.sep.join([self.dest, dir]), exist_ok=True)
+            pipeline = SortPipeline(self.source, self.dest, keys, dirs, controller=self.rate_controller, claims=claims, await_login=needs_login)
+            pipeline.start()
+            if needs_login:
+                pipeline.set_cookies(self._get_cookies())
+            while pipeline.is_running():
+                self.status.config(text=f"Sorting... {pipeline.get_progress()} - {self.rate_controller.get_state()}", bg='yellow')
+                self.window.update()
+                time.sleep(0.1)
+            self.last_run = pipeline.latest
+            results = pipeline.results
+            missed = [tuple(survey) for survey in results["missed"]]
+            retry.add_surveys(missed)
+            result_str = "Sorting process complete!"
+            if missed:
+                result_str = f"Sorted! {len(missed)} surveys queued for later."
+            run_id = dt.now().strftime("%Y-%m-%d-%H-%M-%S")
+            save_path = f"{run_id}.xlsx"
+            if self.verify.get():
+                manifest_id = f"{claims.run_id}-{claims.worker_id}" if claims else run_id
+                results["unverified"] = self._verify_run(self.dest, pipeline.latest, manifest_id)
+                if results["unverified"]:
+                    result_str += f" {len(results['unverified'])} files failed verification!"
+            if claims:
+                claims.post_results(results)
+                parts, complete = claims.get_results()
+                results = self._merge_results(parts)
+                save_path = f"{claims.run_id}.xlsx"
+                if not complete:
+                    result_str += " Other workstations are still sorting."
+        finally:
+            if claims:
+                claims.stop()
+        if self.log.get():
+            self._write_log(os.sep.join([self.dest, save_path]), results, claims.worker_id if claims else None)
+            result_str += f" View your results at {save_path}!"
+        export_failed = dict()
+        if self.export.get():
+            export_folder, export_failed = self.export_halls()
+            result_str += f" Halls exported to {os.path.basename(export_folder)}!"
+            if export_failed:
+                result_str += f" {', '.join(export_failed)} could not be exported!"
+        self.status.config(text=result_str, bg='lightgreen' if not missed and not results["unverified"] and not export_failed else 'yellow')
+
+    def start_jobs(self):
+        '''
+        This function starts running the queued jobs, logging
+        in first if any of them fetch surveys. Nothing is done
+        while a sort or survey fetch is running.
+        '''
+        if self.jobs_job or self.sorting:
+            return
+        queued = [job for job in self.scheduler.jobs if job["status"] == "queued"]
+        if not queued:
+            self.status.config(text="No jobs are queued!", bg='lightgreen')
+            return
+        self.job_cookies = None
+        if any([job["options"]["surveys"] for job in queued]):
+            self.job_cookies = self._get_cookies()
+        self.status.config(text="Running jobs...", bg='yellow')
+        self._tick_jobs()
+
+    def _tick_jobs(self):
+        '''
+        The callback for the job timer, which runs until
+        every queued job has finished.
+        '''
+        self.scheduler.tick(self.job_cookies)
+        if self.scheduler.is_busy():
+            self.jobs_job = self.window.after(500, self._tick_jobs)
         else:
-            self.status.config(text="No connection detected! Aborted!", bg='red')
+            self.jobs_job = None
+            self.status.config(text="All jobs complete!", bg='lightgreen')
+            self._schedule_retry()
+
+    def _finish_job(self, job, pipeline):
+        '''
+        This function queues the missed surveys of a finished
+        job and writes its log file, if the job has logging on.
+
+        Parameters:
+            - job: dict
+                The finished job.
+            - pipeline: SortPipeline
+                The job's finished pipeline.
+        '''
+        retry.add_surveys([tuple(survey) for survey in pipeline.results["missed"]])
+        run_id = dt.now().strftime("%Y-%m-%d-%H-%M-%S")
+        if self.verify.get():
+            pipeline.results["unverified"] = self._verify_run(job["dest"], pipeline.latest, f"{run_id}-{job['id'][:8]}")
+        if job["options"]["log"]:
+            save_path = f"{run_id}.xlsx"
+            self._write_log(os.sep.join([job["dest"], save_path]), pipeline.results)
+        self.status.config(text=f"Finished sorting {os.path.basename(job['source'])}!", bg='yellow')
+
+    def _merge_results(self, parts):
+        '''
+        This function merges the results of several workstations
+        sorting the same input folder into one set of results.
+        Files without a dining hall are seen by every workstation,
+        so they are only listed once.
+
+        Parameters:
+            - parts: List[dict]
+                The results of each workstation.
+        '''
+        merged = {"sorted": [], "bad": [], "dupes": [], "failed": [], "similar": [], "missed": [], "unverified": []}
+        for part in parts:
+            for sheet, rows in part.items():
+                merged[sheet].extend(rows)
+        merged["bad"] = sorted(set(merged["bad"]))
+        return merged
+
+    def _write_log(self, log_path, results, worker_id=None):
+        '''
+        This function writes the results of a sort to an excel
+        sheet. The sheet is written to a temporary file first, so
+        that a log being rewritten is never left half-written.
+
+        Parameters:
+            - log_path: str
+                The path of the excel sheet to write.
+            - results: dict
+                The results of the sort, holding the lists of rows
+                for each sheet of the log. Rows of sorted files can
+                be longer than 3 fields when a name holds a number,
+                so extra columns are added as needed.
+            - worker_id: str
+                The name of this workstation, if the log covers a
+                shared input folder. It is added to the temporary
+                file's name, since every workstation writes the
+                same log.
+        '''
+        width = max([3] + [len(row) for row in results["sorted"]])
+        good_columns = ["Name", "Scheduling Survey Number", "Dining Hall"] + [f"Column {idx}" for idx in range(4, width + 1)]
+        good_df = pd.DataFrame(results["sorted"], columns=good_columns)
+        dupe_df = pd.DataFrame(results["dupes"], columns=['Duplicate Files'])
+        failed_df = pd.DataFrame(results.get("failed", []), columns=['File', 'Error'])
+        bad_df = pd.DataFrame(results["bad"], columns=['Dining Hall Not Found'])
+        similar_df = pd.DataFrame(results["similar"], columns=['File', 'New Folder', 'Existing Folder', 'Similarity'])
+        missed_df = pd.DataFrame(results["missed"], columns=['Scheduling Survey Number', 'Save Path'])
+        unverified_df = pd.DataFrame(results.get("unverified", []), columns=['File', 'Problem'])
+        tmp_name = f"~{worker_id}-{os.path.basename(log_path)}" if worker_id else f"~{os.path.basename(log_path)}"
+        tmp_path = os.sep.join([os.path.dirname(log_path), tmp_name])
+        with pd.ExcelWriter(tmp_path, engine="openpyxl") as writer:
+            good_df.to_excel(writer, index=False, sheet_name = "Sorted Applicants")
+            bad_df.to_excel(writer, index=False, sheet_name = "Unsorted Files - No Hall")
+            dupe_df.to_excel(writer, index=False, sheet_name = "Unsorted Files - Duplicates")
+            failed_df.to_excel(writer, index=False, sheet_name = "Unsorted Files - Errors")
+            similar_df.to_excel(writer, index=False, sheet_name = "Possible Duplicate Names")
+            missed_df.to_excel(writer, index=False, sheet_name = "Surveys Not Fetched")
+            unverified_df.to_excel(writer, index=False, sheet_name = "Failed Verification")
+        os.replace(tmp_path, log_path)
+
+    def export_halls(self):
+        '''
+        This function exports each hall folder in the output
+        folder into its own zip file, placed in a new folder
+        under "Exports" in the output folder. If "Latest Run
+        Only" is checked, only the applicants sorted by the
+        latest run are exported.
+
+        Returns:
+            A tuple of the path of the folder containing the zip
+            files, or None if no output folder is selected, and a
+            dictionary of the halls that failed to their errors.
+        '''
+        if not self.dest:
+            self.status.config(text="No output folder selected!", bg='red')
+            return None, dict()
+        _, dirs = self._load_halls()
+        latest = self.last_run if self.export_latest.get() and self.last_run is not None else None
+        export_folder = os.sep.join([self.dest, "Exports", dt.now().strftime("%Y-%m-%d-%H-%M-%S")])
+        self.status.config(text="Exporting halls...", bg='yellow')
+        self.window.update()
+        def show_progress(dir):
+            self.status.config(text=f"Exported {dir}!", bg='yellow')
             self.window.update()
+        try:
+            _, failed = exporter.export_halls(self.dest, dirs, export_folder, latest=latest, on_progress=show_progress)
+        except OSError as error:
+            failed = {"Exports": str(error)}
+        if failed:
+            errors = "; ".join([f"{dir}: {error}" for dir, error in failed.items()])
+            self.status.config(text=f"Some halls could not be exported! {errors}", bg='red')
+        else:
+            self.status.config(text=f"Halls exported to {export_folder}!", bg='lightgreen')
+        return export_folder, failed
+
+    def _verify_run(self, dest, latest, manifest_id):
+        '''
+        This function checks the files produced by a sort and
+        writes the run's manifest, showing its progress in the
+        status label.
+
+        Parameters:
+            - dest: str
+                The output folder of the sort.
+            - latest: Dict[str, Set[str]]
+                The applicant folders produced by the sort, by hall folder.
+            - manifest_id: str
+                The name of the run's manifest.
+
+        Returns:
+            The [file, problem] rows of the files that failed.
+        '''
+        def show_progress(count):
+            if count % 50 == 0:
+                self.status.config(text=f"Verifying files... {count} checked", bg='yellow')
+                self.window.update()
+        problems = verifier.verify_run(dest, latest, manifest_id, on_progress=show_progress)
+        return [[entry["File"], entry["Problem"]] for entry in problems]
+
+    def verify_output(self, accept=False):
+        '''
+        This function checks every file listed in the manifests
+        of the output folder again. Only files whose size or
+        modified time has changed since they were last checked
+        are rehashed.
+
+        Parameters:
+            - accept: bool
+                If True, every file is rehashed and its current
+                checksum replaces the one in its manifest.
+        '''
+        if not self.dest:
+            self.status.config(text="No output folder selected!", bg='red')
             return
+        self.status.config(text="Verifying files...", bg='yellow')
+        self.window.update()
+        def show_progress(count):
+            if count % 50 == 0:
+                self.status.config(text=f"Verifying files... {count} checked", bg='yellow')
+                self.window.update()
+        problems = verifier.reverify(self.dest, on_progress=show_progress, accept=accept)
+        if problems:
+            self.status.config(text=f"{len(problems)} files failed verification! See the manifests in {verifier.manifests_name}.", bg='red')
+        else:
+            self.status.config(text="Every file passed verification!", bg='lightgreen')
+
+    def accept_checksums(self):
+        '''
+        This function asks for confirmation, then checks every
+        file listed in the manifests of the output folder again,
+        keeping each file's current checksum as the one to check
+        against later.
+        '''
+        if not self.dest:
+            self.status.config(text="No output folder selected!", bg='red')
+            return
+        message = "Every file in the output folder's manifests will be checked against its current contents from now on, including files reported as \"Checksum changed\". Continue?"
+        if tk.messagebox.askyesno(title="Accept Current Checksums", message=message):
+            self.verify_output(accept=True)
+
+    def _fetch_surveys(self, surveys, prompt_login=True):
+        '''
+        This function fetches the given Scheduling Surveys,
+        logging in first if needed.
+
+        Parameters:
+            - surveys: List[Tuple[int, str]]
+                The (ssid, save_path) pairs to fetch.
+            - prompt_login: bool
+                If False, the surveys are not fetched when no
+                login cookies are available, instead of opening
+                the login window.
+
+        Returns:
+            The list of (ssid, save_path) pairs that could not
+            be fetched, or None if no lookup was made because
+            there is no network connection or login.
+        '''
+        if not surveys:
+            return []
+        cookies = self._get_cookies(prompt_login)
+        if cookies is None:
+            return None
+        def show_progress(count):
+            state = self.rate_controller.get_state()
+            self.status.config(text=f"Fetching surveys... ({count}/{len(surveys)}) - {state}", bg='yellow')
+            self.window.update()
+        show_progress(0)
+        _, failed = pwfuncs.get_surveys(cookies, surveys, on_progress=show_progress, controller=self.rate_controller, browser_slots=self.scheduler.browser_slots)
+        failed = set(failed)
+        return [survey for survey in surveys if survey[1] in failed]
+
+    def _get_cookies(self, prompt_login=True):
+        '''
+        This function checks for a network connection and
+        returns the login cookies, logging in first if needed.
+
+        Parameters:
+            - prompt_login: bool
+                If False, the login window is never opened.
+
+        Returns:
+            The login cookies, or None if there is no network
+            connection or the user is not logged in.
+        '''
+        self.status.config(text="Checking for network connectivity...", bg='yellow')
+        self.window.update()
+        if not pwfuncs.check_connection():
+            return None
         cookies = pwfuncs.cookies
-        if not cookies:
+        if cookies is None and prompt_login:
             self.status.config(text="Please login to your VT account!", bg='yellow')
             self.window.update()
-        if not cookies:
             cookies = pwfuncs.get_login()
-            if not cookies:
-                self.status.config(text="Login Failed! Aborting!", bg='red')
-                self.window.update()
-                return
-        self.status.config(text="Sorting...", bg='yellow')
-        self.window.update()
-        good_results = dict()
-        bad_keys = []
-        dupes = []
-        pdf_files = sorted([filename for filename in os.listdir(self.source) if filename.endswith(".pdf")])
+        return cookies
+
+    def fetch_missing_surveys(self, force=True):
+        '''
+        This function fetches the Scheduling Surveys waiting
+        in the retry queue.
+
+        Parameters:
+            - force: bool
+                If True, every queued survey is fetched, and the
+                login window is opened if needed. Otherwise, only
+                the surveys whose backoff has elapsed are fetched,
+                and only if already logged in.
+
+        Nothing is done while a sort is running, and the Sort
+        button is disabled until the surveys are fetched.
+        '''
+        if self.sorting:
+            return
+        self.sorting = True
+        sort_state = self.sort_btn.cget("state")
+        self.sort_btn.config(state=tk.DISABLED)
+        try:
+            due = [(entry["ssid"], entry["save_path"]) for entry in retry.get_due(force)]
+            if due:
+                missed = self._fetch_surveys(due, prompt_login=force)
+                if missed is not None:
+                    missed_paths = {save_path for _, save_path in missed}
+                    retry.post_results([save_path for _, save_path in due if save_path not in missed_paths], missed_paths)
+                remaining = len(retry.get_queue())
+                if missed is None:
+                    self.status.config(text=f"{remaining} surveys queued, waiting for a connection and login.", bg='yellow')
+                elif remaining:
+                    self.status.config(text=f"{remaining} surveys still queued.", bg='yellow')
+                else:
+                    self.status.config(text="All queued surveys fetched!", bg='lightgreen')
+            elif force:
+                self.status.config(text="No surveys are queued!", bg='lightgreen')
+        finally:
+            self.sorting = False
+            self.sort_btn.config(state=sort_state)
+            self._schedule_retry()
+
+    def _schedule_retry(self):
+        '''
+        This function schedules the next automatic attempt at
+        fetching the queued Scheduling Surveys, if any are queued.
+        '''
+        if self.retry_job:
+            self.window.after_cancel(self.retry_job)
+            self.retry_job = None
+        delay = retry.get_next_delay()
+        if delay is None:
+            return
+        self.retry_job = self.window.after(int(max(delay, retry.base_delay) * 1000), self._auto_retry)
+
+    def _auto_retry(self):
+        '''
+        The callback for the automatic retry timer.
+        '''
+        self.retry_job = None
+        self.fetch_missing_surveys(force=False)
 
-        keys, dirs = self._load_halls()
-        if self.all_folders.get():
-            for dir in dirs:
-                os.makedirs(os.sep.join([self.dest, dir]), exist_ok=True)
-        with sync_playwright() as pw:
-            first_nav = True
-            browser = pw.chromium.launch(headless=True)
-            p = browser.new_page()
-            p.context.add_cookies(cookies)
-            pwfuncs.navigate_to_results(p)
-            for index, filename in enumerate(pdf_files, start=1):
-                if not pwfuncs.check_connection():
-                    self.status.config(text="Connection Lost! Aborting...", bg='red')
-                    self.window.update()
-                    break
-                sort_details = self._get_sort_details(filename, keys)
-                if len(sort_details) == 1:
-                    bad_keys.append(sort_details[0])
-                    continue
-                dest_folder = os.sep.join([self.dest, dirs[keys.index(sort_details[-1])]])
-                if not os.path.exists(dest_folder):
-                    os.makedirs(dest_folder)
-                applicant_folder = os.sep.join([dest_folder, sort_details[0].strip()])
-                if not os.path.exists(applicant_folder):
-                    os.makedirs(applicant_folder)
-                try:
-                    os.rename(os.sep.join([self.source, filename]), os.sep.join([applicant_folder, f"{sort_details[0]} Hiring Documents.pdf"]))
-                    if len(sort_details) == 3:
-                        pwfuncs.get_survey(p, sort_details[1], os.sep.join([applicant_folder, f"{sort_details[0]} Scheduling Survey.pdf"]), new_navigation=first_nav)
-                        first_nav = False
-                    else:
-                        sort_details.insert(1, -1)
-                    good_results[index] = sort_details
-                except OSError:
-                    dupes.append(filename)
-        result_str = "Sorting process complete!"
-        if self.log.get():
-            good_df = pd.DataFrame.from_dict(good_results, orient='index')
-            good_df.rename(columns={0: "Name", 1: "Scheduling Survey Number", 2: "Dining Hall"}, inplace=True)
-            dupe_df = pd.DataFrame(dupes, columns=['Duplicate Files'])
-            bad_df = pd.DataFrame(bad_keys, columns=['Dining Hall Not Found'])
-            save_path = f"{dt.now().strftime("%Y-%m-%d-%H-%M-%S")}.xlsx"
-            with pd.ExcelWriter(f"{self.dest}/{save_path}", engine="openpyxl") as writer:
-                good_df.to_excel(writer, index=False, sheet_name = "Sorted Applicants")
-                bad_df.to_excel(writer, index=False, sheet_name = "Unsorted Files - No Hall")
-                dupe_df.to_excel(writer, index=False, sheet_name = "Unsorted Files - Duplicates")
-            result_str += f" View your results at {save_path}!"
-        self.status.config(text=result_str, bg='lightgreen')
-   
     def _get_sort_details(self, filename, keys):
         '''
         This function returns a list of details used
@@ -378,20 +876,7 @@ class Organizer():
             the filename is returned as a 1-elem list
             containing only the filename.
         '''
-        ssid_pattern = r"\s+\d+\s+"
-        file_no_ext = filename[:-4].strip()
-        if not any([file_no_ext.endswith(key) for key in keys]):
-            return [filename]
-        ssid_matches = re.findall(ssid_pattern, file_no_ext)
-        if len(ssid_matches) > 0:
-            details = file_no_ext.split(ssid_matches[0])
-            details.insert(1, int(ssid_matches[0]))
-            return details
-        else:
-            for key in keys:
-                if file_no_ext.endswith(key):
-                    name = file_no_ext[:-len(key)].strip()
-                    return [name, key]
+        return get_sort_details(filename, keys)
 
     def _load_halls(self):
         '''
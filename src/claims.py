@@ -0,0 +1,445 @@
+import os, json, time, uuid, socket, threading, argparse, tempfile
+from multiprocessing import Process
+from datetime import datetime as dt
+
+claims_name = ".claims"
+lease_timeout = 120
+heartbeat_interval = 20
+
+class ClaimManager():
+    '''
+    This class lets several workstations sort the same input
+    folder at once. Before a file is moved, the worker claims it
+    by creating a marker file in the ".claims" folder of the input
+    folder. Creating the marker is atomic, so only one worker can
+    hold a file at a time. Held markers are touched regularly, and
+    markers left behind by a worker that stopped touching them are
+    taken over by the next worker to reach that file. Each marker
+    holds a token unique to the claim, so a worker can check that
+    its claim was not taken over before moving the file.
+
+    The results of every worker are saved to a shared run folder,
+    so that each worker can write a log covering the whole run.
+    '''
+    def __init__(self, source, worker_id=None):
+        '''
+        Parameters:
+            - source: str
+                The input folder shared by the workers.
+            - worker_id: str
+                The unique name of this worker. Defaults to the
+                computer name and process ID.
+        '''
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.claims_folder = os.sep.join([source, claims_name])
+        self.runs_folder = os.sep.join([self.claims_folder, "runs"])
+        os.makedirs(self.runs_folder, exist_ok=True)
+        self.held = dict()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.heartbeat_thread = None
+        self.run_id = None
+
+    def _get_marker(self, filename):
+        '''
+        This function returns the path of the marker file
+        used to claim the given file.
+        '''
+        return os.sep.join([self.claims_folder, f"{filename}.claim"])
+
+    def _read_marker(self, marker):
+        '''
+        This function returns the contents and modified time
+        of the given marker.
+        '''
+        with open(marker, 'r', encoding='utf-8') as in_file:
+            contents = in_file.read()
+        return contents, os.path.getmtime(marker)
+
+    def _get_server_time(self):
+        '''
+        This function returns the current time according to the
+        shared folder, by touching a file owned by this worker.
+        Comparing marker times against this instead of the local
+        clock keeps leases correct when workstation clocks differ.
+        '''
+        clock_file = os.sep.join([self.claims_folder, f"{self.worker_id}.clock"])
+        with open(clock_file, 'w', encoding='utf-8') as out_file:
+            out_file.write(self.worker_id)
+        return os.path.getmtime(clock_file)
+
+    def claim(self, filename):
+        '''
+        This function attempts to claim the given file for
+        this worker, taking over the claim if its lease is stale.
+
+        Parameters:
+            - filename: str
+                The name of the file in the input folder.
+
+        Returns:
+            True if this worker now holds the file, False otherwise.
+        '''
+        marker = self._get_marker(filename)
+        for _ in range(2):
+            try:
+                fd = os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._take_over(marker):
+                    return False
+                continue
+            token = f"{self.worker_id} {uuid.uuid4().hex}"
+            with os.fdopen(fd, 'w', encoding='utf-8') as out_file:
+                out_file.write(token)
+            with self.lock:
+                self.held[filename] = token
+            return True
+        return False
+
+    def holds(self, filename):
+        '''
+        This function checks that this worker's claim on the
+        given file is still in place. To be called right before
+        moving the file.
+
+        Parameters:
+            - filename: str
+                The name of the file in the input folder.
+
+        Returns:
+            True if the file's marker still holds this worker's
+            token, False otherwise.
+        '''
+        with self.lock:
+            token = self.held.get(filename)
+        try:
+            return token is not None and self._read_marker(self._get_marker(filename))[0] == token
+        except OSError:
+            return False
+
+    def _take_over(self, marker):
+        '''
+        This function removes the given marker if its lease
+        is stale. Only one worker can rename a marker away, so
+        two workers cannot take over the same stale claim.
+
+        Checking the lease and renaming the marker are separate
+        steps, so another worker may have taken over the claim in
+        between. The renamed marker is therefore compared with the
+        stale one, and put back if it is a newer claim.
+
+        Returns:
+            True if the marker was removed, False otherwise.
+        '''
+        stale_marker = f"{marker}.{self.worker_id}.stale"
+        try:
+            stale = self._read_marker(marker)
+            if self._get_server_time() - stale[1] < lease_timeout:
+                return False
+            os.rename(marker, stale_marker)
+        except OSError:
+            return False
+        try:
+            if self._read_marker(stale_marker) == stale:
+                os.remove(stale_marker)
+                return True
+            os.link(stale_marker, marker)
+        except OSError:
+            pass
+        try:
+            os.remove(stale_marker)
+        except OSError:
+            pass
+        return False
+
+    def release(self, filename):
+        '''
+        This function releases this worker's claim on the given
+        file. The marker is left in place if it no longer holds
+        this worker's token.
+
+        Parameters:
+            - filename: str
+                The name of the file in the input folder.
+        '''
+        with self.lock:
+            token = self.held.pop(filename, None)
+        marker = self._get_marker(filename)
+        try:
+            if token is not None and self._read_marker(marker)[0] == token:
+                os.remove(marker)
+        except OSError:
+            pass
+
+    def _get_part(self):
+        '''
+        This function returns the path of the file holding
+        this worker's results for the current run.
+        '''
+        return os.sep.join([self.runs_folder, self.run_id, f"{self.worker_id}.json"])
+
+    def _heartbeat(self):
+        '''
+        This function touches this worker's results file and
+        the marker of every file it holds until the manager
+        is stopped.
+        '''
+        while not self.stopped.wait(heartbeat_interval):
+            with self.lock:
+                held = list(self.held)
+            for path in [self._get_part()] + [self._get_marker(filename) for filename in held]:
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+
+    def _read_run(self, run_file):
+        '''
+        This function returns the ID of the current run, waiting
+        briefly in case the run file is still being written.
+
+        Returns:
+            The run ID, or None if the run file no longer exists.
+        '''
+        for _ in range(10):
+            try:
+                with open(run_file, 'r', encoding='utf-8') as in_file:
+                    return json.load(in_file)["run_id"]
+            except FileNotFoundError:
+                return None
+            except (OSError, ValueError):
+                time.sleep(0.1)
+        raise OSError(f"Could not read the current run from {run_file}")
+
+    def _is_stale_run(self, run_file, run_id):
+        '''
+        This function checks whether a run was left behind, with
+        no worker still sorting in it. This happens when a worker
+        crashes, since get_results then never sees the run complete.
+
+        Returns:
+            True if the run is older than the lease timeout and
+            every worker in it has finished or stopped touching its
+            results file, False otherwise.
+        '''
+        try:
+            now = self._get_server_time()
+            if now - os.path.getmtime(run_file) < lease_timeout:
+                return False
+            run_folder = os.sep.join([self.runs_folder, run_id])
+            if not os.path.isdir(run_folder):
+                return True
+            for part_name in os.listdir(run_folder):
+                if not part_name.endswith(".json"):
+                    continue
+                part_file = os.sep.join([run_folder, part_name])
+                with open(part_file, 'r', encoding='utf-8') as in_file:
+                    part = json.load(in_file)
+                if not part["done"] and now - os.path.getmtime(part_file) < lease_timeout:
+                    return False
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def _close_run(self, run_file, run_id):
+        '''
+        This function removes the run file of a stale run. Like
+        _take_over, the file is renamed away first, and put back if
+        another worker replaced it with a new run in the meantime.
+
+        Returns:
+            True if the stale run was closed, False otherwise.
+        '''
+        stale_file = f"{run_file}.{self.worker_id}.stale"
+        try:
+            os.rename(run_file, stale_file)
+        except OSError:
+            return False
+        try:
+            with open(stale_file, 'r', encoding='utf-8') as in_file:
+                if json.load(in_file)["run_id"] == run_id:
+                    os.remove(stale_file)
+                    return True
+            os.link(stale_file, run_file)
+        except (OSError, ValueError):
+            pass
+        try:
+            os.remove(stale_file)
+        except OSError:
+            pass
+        return False
+
+    def start(self):
+        '''
+        This function joins the current run, starting a new one
+        if no other worker is sorting, and starts the heartbeat.
+        A run left behind by crashed workers is closed, so that
+        its log is never overwritten by a later run.
+        '''
+        run_file = os.sep.join([self.claims_folder, "run.json"])
+        self.run_id = None
+        for _ in range(10):
+            try:
+                fd = os.open(run_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                run_id = self._read_run(run_file)
+                if run_id is None or self._is_stale_run(run_file, run_id) and self._close_run(run_file, run_id):
+                    continue
+                self.run_id = run_id
+                break
+            self.run_id = dt.now().strftime("%Y-%m-%d-%H-%M-%S")
+            with os.fdopen(fd, 'w', encoding='utf-8') as out_file:
+                json.dump({"run_id": self.run_id}, out_file)
+            break
+        if self.run_id is None:
+            raise OSError(f"Could not join or start a run in {self.claims_folder}")
+        os.makedirs(os.sep.join([self.runs_folder, self.run_id]), exist_ok=True)
+        self.post_results(None)
+        self.stopped.clear()
+        self.heartbeat_thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self.heartbeat_thread.start()
+
+    def stop(self):
+        '''
+        This function stops the heartbeat and releases every
+        file still held by this worker. To be called once the
+        run's results have been read.
+        '''
+        self.stopped.set()
+        if self.heartbeat_thread:
+            self.heartbeat_thread.join()
+            self.heartbeat_thread = None
+        with self.lock:
+            held = list(self.held)
+        for filename in held:
+            self.release(filename)
+        try:
+            os.remove(os.sep.join([self.claims_folder, f"{self.worker_id}.clock"]))
+        except OSError:
+            pass
+
+    def post_results(self, results):
+        '''
+        This function saves this worker's results to the run
+        folder. Passing None marks the worker as still sorting.
+
+        Parameters:
+            - results: dict
+                The worker's results, which must be JSON serializable.
+        '''
+        part_file = self._get_part()
+        with open(f"{part_file}.tmp", 'w', encoding='utf-8') as out_file:
+            json.dump({"done": results is not None, "results": results}, out_file, ensure_ascii=False)
+        os.replace(f"{part_file}.tmp", part_file)
+
+    def get_results(self):
+        '''
+        This function returns the results of every worker in
+        the run that has finished. Workers whose results file has
+        not been touched within the lease timeout are assumed to
+        have crashed. If every worker has finished, the run is
+        closed so that the next worker starts a new one.
+
+        Returns:
+            A tuple of the list of finished workers' results, and
+            True if every worker in the run has finished.
+        '''
+        run_folder = os.sep.join([self.runs_folder, self.run_id])
+        results = []
+        complete = True
+        now = self._get_server_time()
+        for part_name in sorted(os.listdir(run_folder)):
+            if not part_name.endswith(".json"):
+                continue
+            part_file = os.sep.join([run_folder, part_name])
+            with open(part_file, 'r', encoding='utf-8') as in_file:
+                part = json.load(in_file)
+            if part["done"]:
+                results.append(part["results"])
+            elif now - os.path.getmtime(part_file) < lease_timeout:
+                complete = False
+        if complete:
+            try:
+                os.remove(os.sep.join([self.claims_folder, "run.json"]))
+            except OSError:
+                pass
+        return results, complete
+
+def _check_worker(source, dest, worker_id):
+    '''
+    This function runs one worker of the claims check, moving
+    every file it can claim from the source into its own folder.
+    '''
+    claims = ClaimManager(source, worker_id)
+    claims.start()
+    worker_dest = os.sep.join([dest, worker_id])
+    os.makedirs(worker_dest, exist_ok=True)
+    moved = []
+    for filename in sorted(os.listdir(source)):
+        if not filename.endswith(".pdf") or not claims.claim(filename):
+            continue
+        try:
+            if os.path.exists(os.sep.join([source, filename])) and claims.holds(filename):
+                os.rename(os.sep.join([source, filename]), os.sep.join([worker_dest, filename]))
+                moved.append(filename)
+        finally:
+            claims.release(filename)
+    claims.post_results({"moved": moved})
+    claims.stop()
+
+def check(workers=3, files=500, stale=50):
+    '''
+    This function checks the claims protocol by having several
+    local processes move the files of one temporary input folder
+    at once, some of them behind stale claims left by a crashed
+    worker.
+
+    Parameters:
+        - workers: int
+            The number of processes to start.
+        - files: int
+            The number of files to create in the input folder.
+        - stale: int
+            The number of files given a stale claim before the
+            processes start.
+
+    Returns:
+        True if every file was moved exactly once, False otherwise.
+    '''
+    root = tempfile.mkdtemp()
+    source = os.sep.join([root, "input"])
+    dest = os.sep.join([root, "output"])
+    os.makedirs(os.sep.join([source, claims_name, "runs"]))
+    filenames = [f"Applicant {idx} {idx} Hall.pdf" for idx in range(files)]
+    for filename in filenames:
+        with open(os.sep.join([source, filename]), 'w', encoding='utf-8') as out_file:
+            out_file.write(filename)
+    crashed_time = time.time() - 2 * lease_timeout
+    for filename in filenames[:stale]:
+        marker = os.sep.join([source, claims_name, f"{filename}.claim"])
+        with open(marker, 'w', encoding='utf-8') as out_file:
+            out_file.write("crashed-worker")
+        os.utime(marker, (crashed_time, crashed_time))
+    processes = [Process(target=_check_worker, args=(source, dest, f"check-{idx}")) for idx in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    moved = []
+    for worker_id in os.listdir(dest):
+        moved.extend(os.listdir(os.sep.join([dest, worker_id])))
+    left = [filename for filename in os.listdir(source) if filename.endswith(".pdf")]
+    ok = sorted(moved) == sorted(filenames) and not left
+    print(f"{len(moved)} moves of {files} files by {workers} workers, {len(left)} left in the input folder.")
+    print(f"Temporary folders kept at {root}")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the claims protocol with several local processes.")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--stale", type=int, default=50)
+    args = parser.parse_args()
+    ok = check(args.workers, args.files, args.stale)
+    print("Every file was moved exactly once." if ok else "Check failed!")
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,120 @@
+import os, csv, io
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+manifest_name = "manifest.csv"
+
+def export_hall(hall_path, zip_path, applicants=None):
+    '''
+    This function writes the applicant folders of a hall
+    folder into a zip file, along with a manifest listing
+    every file included. Files are streamed into the zip
+    one at a time, so memory use does not grow with the
+    size of the hall.
+
+    Parameters:
+        - hall_path: str
+            The path to the hall folder to export.
+        - zip_path: str
+            The path of the zip file to create.
+        - applicants: Set[str]
+            The names of the applicant folders to include.
+            If None, every applicant folder is included.
+
+    Returns:
+        The manifest as a list of [path in zip, size in bytes].
+    '''
+    tmp_path = f"{zip_path}.tmp"
+    try:
+        manifest = _write_hall(hall_path, tmp_path, applicants)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    os.replace(tmp_path, zip_path)
+    return manifest
+
+def _write_hall(hall_path, tmp_path, applicants):
+    '''
+    This function writes the zip file for export_hall.
+
+    Returns:
+        The manifest as a list of [path in zip, size in bytes].
+    '''
+    hall_dir = os.path.basename(hall_path)
+    manifest = []
+    with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        with os.scandir(hall_path) as entries:
+            applicant_dirs = sorted([entry.name for entry in entries if entry.is_dir()])
+        for applicant in applicant_dirs:
+            if applicants is not None and applicant not in applicants:
+                continue
+            for root, _, filenames in os.walk(os.sep.join([hall_path, applicant])):
+                for filename in sorted(filenames):
+                    file_path = os.sep.join([root, filename])
+                    arcname = "/".join([hall_dir, os.path.relpath(file_path, hall_path).replace(os.sep, "/")])
+                    archive.write(file_path, arcname)
+                    manifest.append([arcname, os.path.getsize(file_path)])
+        manifest_file = io.StringIO()
+        writer = csv.writer(manifest_file)
+        writer.writerow(["File", "Size"])
+        writer.writerows(manifest)
+        archive.writestr("/".join([hall_dir, manifest_name]), manifest_file.getvalue())
+    return manifest
+
+def export_halls(dest, dirs, out_folder, latest=None, on_progress=None):
+    '''
+    This function exports each hall folder in the output
+    folder into its own zip file, compressing the halls in
+    parallel with a process pool. A hall that fails to export,
+    such as one holding a locked file, does not stop the others.
+
+    Parameters:
+        - dest: str
+            The output folder containing the hall folders.
+        - dirs: List[str]
+            The names of the hall folders to export.
+        - out_folder: str
+            The folder to write the zip files to.
+        - latest: Dict[str, Set[str]]
+            If provided, only the applicant folders listed for
+            each hall are exported, and halls not listed are
+            skipped.
+        - on_progress: function
+            Called with the name of each hall folder as its
+            zip file is completed, if provided.
+
+    Returns:
+        A tuple of two dictionaries, the hall folder names of
+        the exported halls to their manifests, and the hall
+        folder names of the halls that failed to their errors.
+    '''
+    os.makedirs(out_folder, exist_ok=True)
+    halls = []
+    for dir in dirs:
+        hall_path = os.sep.join([dest, dir])
+        if not os.path.isdir(hall_path):
+            continue
+        if latest is not None and not latest.get(dir):
+            continue
+        halls.append(dir)
+    manifests = dict()
+    failed = dict()
+    if not halls:
+        return manifests, failed
+    with ProcessPoolExecutor(max_workers=min(len(halls), os.cpu_count() or 1)) as pool:
+        futures = dict()
+        for dir in halls:
+            applicants = None if latest is None else latest[dir]
+            future = pool.submit(export_hall, os.sep.join([dest, dir]), os.sep.join([out_folder, f"{dir}.zip"]), applicants)
+            futures[future] = dir
+        for future in as_completed(futures):
+            try:
+                manifests[futures[future]] = future.result()
+            except Exception as error:
+                failed[futures[future]] = str(error)
+            if on_progress:
+                on_progress(futures[future])
+    return manifests, failed
@@ -0,0 +1,279 @@
+import time, random, threading, argparse
+from urllib.parse import urlsplit, parse_qs, quote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+form_path = "/Pages/DesignPageV2.aspx"
+form_query = "origin=NeoPortalPage&subpage=design&id=stub&analysis=true"
+auth_cookie = "stub_auth=1"
+
+design_page = """<!DOCTYPE html>
+<html>
+<head><title>Scheduling Survey</title></head>
+<body>
+<h1>Scheduling Survey</h1>
+<button id="individual">Check individual results</button>
+<div id="results" style="display:none">
+    <input id="response" value="3">
+    <div id="content"></div>
+</div>
+<script>
+    const input = document.getElementById("response");
+    const content = document.getElementById("content");
+    let latest = 0;
+    function show(number) {
+        const request = ++latest;
+        content.textContent = "Loading...";
+        fetch("/responses/" + number).then(function (response) {
+            return response.text().then(function (text) {
+                if (request !== latest) return;
+                content.innerHTML = response.ok ? text : "<p>Error " + response.status + "</p>";
+            });
+        }).catch(function () {
+            if (request === latest) content.textContent = "Network error";
+        });
+    }
+    document.getElementById("individual").addEventListener("click", function () {
+        document.getElementById("results").style.display = "block";
+        show(input.value);
+    });
+    input.addEventListener("input", function () {
+        input.setAttribute("value", input.value);
+        show(input.value);
+    });
+</script>
+</body>
+</html>
+"""
+
+login_page = """<!DOCTYPE html>
+<html>
+<head><title>Sign in</title></head>
+<body>
+<form method="post" action="/login?next={next}">
+    <button type="submit">Sign in</button>
+</form>
+</body>
+</html>
+"""
+
+response_page = """<h2>Response {number}</h2>
+<p>Name: Applicant {number}</p>
+<p>Availability: Monday to Friday, 8am to 2pm</p>
+"""
+
+class FormsStub():
+    '''
+    This class runs a local stand-in for the Microsoft Forms
+    results page, reproducing the parts of the page used by
+    playwright_funcs: the "Check individual results" button,
+    the response number input and each response's contents.
+
+    Each response lookup can be slowed down, throttled, timed
+    out or failed, so that survey fetching can be measured and
+    tested without a network connection. Pass the stand-in's
+    url to playwright_funcs.set_forms_url to sort against it.
+    '''
+    def __init__(self, port=8765, latency=0.2, jitter=0.1, rate=None, timeout_rate=0.0, timeout=30.0, error_rate=0.0, require_login=False):
+        '''
+        Parameters:
+            - port: int
+                The port to serve the stand-in on.
+            - latency: float
+                The base time in seconds taken to return a response.
+            - jitter: float
+                The most time in seconds randomly added to the latency.
+            - rate: float
+                The most response lookups allowed per second before
+                lookups are throttled with a 429 error. If None,
+                lookups are never throttled.
+            - timeout_rate: float
+                The chance (0 to 1) that a lookup hangs for the
+                timeout before being answered.
+            - timeout: float
+                The time in seconds a timed out lookup hangs for.
+            - error_rate: float
+                The chance (0 to 1) that a lookup fails with a
+                500 error.
+            - require_login: bool
+                If True, the results page redirects to a sign in
+                page until the sign in button is clicked.
+        '''
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.rate = rate
+        self.timeout_rate = timeout_rate
+        self.timeout = timeout
+        self.error_rate = error_rate
+        self.require_login = require_login
+        self.url = f"http://127.0.0.1:{port}{form_path}?{form_query}"
+        self.lock = threading.Lock()
+        self.tokens = rate or 0
+        self.last_refill = time.monotonic()
+        self.lookups = 0
+        self.throttled = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.outcomes = dict()
+        self.server = None
+
+    def _take_token(self):
+        '''
+        This function returns True if a lookup is allowed under
+        the rate limit, using a token bucket refilled at the rate.
+        '''
+        if self.rate is None:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            if self.tokens < 1:
+                self.throttled += 1
+                return False
+            self.tokens -= 1
+            return True
+
+    def _record(self, number, outcome):
+        '''
+        This function records how the latest lookup of a response
+        number was answered: the status code sent, or "timeout" if
+        it hung before being answered.
+        '''
+        with self.lock:
+            self.outcomes[number] = outcome
+
+    def start(self):
+        '''
+        This function starts serving the stand-in in a
+        background thread.
+        '''
+        handler = type("Handler", (StubHandler,), {"stub": self})
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), handler)
+        self.port = self.server.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}{form_path}?{form_query}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        '''
+        This function stops serving the stand-in.
+        '''
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+class StubHandler(BaseHTTPRequestHandler):
+    '''
+    This class answers requests to the FormsStub it is
+    attached to.
+    '''
+    stub = None
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8", headers=None):
+        '''
+        This function sends a response with the given body. A
+        client that gave up waiting, such as after a timed out
+        lookup, is ignored.
+        '''
+        body = body.encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or dict()).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _logged_in(self):
+        '''
+        This function returns True if the request has the
+        sign in cookie, or if signing in is not required.
+        '''
+        return not self.stub.require_login or auth_cookie in self.headers.get("Cookie", "")
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == form_path:
+            if not self._logged_in():
+                self._send(302, "", headers={"Location": f"/login?next={quote(self.path, safe='')}"})
+                return
+            self._send(200, design_page)
+        elif url.path == "/login":
+            next_path = parse_qs(url.query).get("next", [f"{form_path}?{form_query}"])[0]
+            self._send(200, login_page.format(next=quote(next_path, safe='')))
+        elif url.path.startswith("/responses/"):
+            self._lookup(url.path[len("/responses/"):])
+        else:
+            self._send(404, "Not found")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/login":
+            self._send(404, "Not found")
+            return
+        next_path = parse_qs(url.query).get("next", [f"{form_path}?{form_query}"])[0]
+        if not next_path.startswith("/"):
+            next_path = f"{form_path}?{form_query}"
+        self._send(302, "", headers={"Location": next_path, "Set-Cookie": f"{auth_cookie}; Path=/"})
+
+    def _lookup(self, number):
+        '''
+        This function answers a response lookup, applying the
+        stand-in's latency, throttling, timeouts and errors.
+        '''
+        stub = self.stub
+        if not self._logged_in():
+            self._send(401, "Sign in required")
+            return
+        if not number.isdigit():
+            self._send(404, "No such response")
+            return
+        number = int(number)
+        with stub.lock:
+            stub.lookups += 1
+        if not stub._take_token():
+            stub._record(number, 429)
+            self._send(429, "Too many requests", headers={"Retry-After": "1"})
+            return
+        timed_out = random.random() < stub.timeout_rate
+        if timed_out:
+            with stub.lock:
+                stub.timeouts += 1
+            time.sleep(stub.timeout)
+        time.sleep(stub.latency + random.uniform(0, stub.jitter))
+        if random.random() < stub.error_rate:
+            with stub.lock:
+                stub.errors += 1
+            stub._record(number, 500)
+            self._send(500, "Internal server error")
+            return
+        stub._record(number, "timeout" if timed_out else 200)
+        self._send(200, response_page.format(number=number))
+
+    def log_message(self, format, *args):
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Microsoft Forms results page.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--rate", type=float, default=None)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--require-login", action="store_true")
+    args = parser.parse_args()
+    stub = FormsStub(args.port, args.latency, args.jitter, args.rate, args.timeout_rate, args.timeout, args.error_rate, args.require_login)
+    stub.start()
+    print(f"Serving the Forms stand-in at {stub.url}")
+    print("Run the app with FILE_ORGANIZER_FORMS_URL set to this url to sort against it.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stub.stop()
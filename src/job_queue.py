@@ -0,0 +1,195 @@
+import os, json, uuid, threading
+import save_handler as saves
+from sort_pipeline import SortPipeline
+
+jobs_file = f"{saves.save_folder}/jobs.json"
+max_local_jobs = 2
+max_survey_jobs = 2
+disk_slots = 2
+browser_slots = 4
+
+def get_jobs():
+    '''
+    This function retrieves the saved list of sort jobs.
+    Jobs that were running when the app closed are queued
+    again, and pick up the files they had not yet moved.
+    '''
+    if not os.path.exists(jobs_file):
+        return []
+    with open(jobs_file, 'r', encoding='utf-8') as in_file:
+        jobs = json.load(in_file)
+    for job in jobs:
+        if job["status"] == "running":
+            job["status"] = "queued"
+    return jobs
+
+def post_jobs(jobs):
+    '''
+    This function saves the list of sort jobs.
+
+    Parameters:
+        - jobs: List[dict]
+            The sort jobs, as returned by get_jobs.
+    '''
+    tmp_file = f"{jobs_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as out_file:
+        json.dump(jobs, out_file, ensure_ascii=False, indent=4)
+    os.replace(tmp_file, jobs_file)
+
+def new_job(source, dest, halls, options, priority=0):
+    '''
+    This function returns a new sort job.
+
+    Parameters:
+        - source: str
+            The input folder to sort.
+        - dest: str
+            The output folder to sort into.
+        - halls: dict
+            The hall settings to sort with, in the same format
+            as save_handler.get_saves.
+        - options: dict
+            The job's settings, with the boolean keys "all_folders",
+            "log" and "surveys". Jobs with "surveys" set to False
+            queue every Scheduling Survey for later instead of
+            fetching it.
+        - priority: int
+            Jobs with a higher priority are started first.
+    '''
+    return {
+        "id": uuid.uuid4().hex,
+        "source": source,
+        "dest": dest,
+        "halls": halls,
+        "options": options,
+        "priority": priority,
+        "status": "queued"
+    }
+
+class JobScheduler():
+    '''
+    This class runs the saved sort jobs, several at a time.
+
+    Jobs fetching surveys and local-only jobs are limited
+    separately, so local-only jobs never wait for a free spot
+    behind jobs that are busy fetching surveys. Every running
+    job shares one limit on files being moved at once, one limit
+    on open browsers, and one RateController for survey lookups.
+    The limit on files being moved is below the number of jobs that
+    can run at once, so several jobs never move files all together.
+    '''
+    def __init__(self, controller, on_finish):
+        '''
+        Parameters:
+            - controller: RateController
+                The controller pacing the survey lookups of every job.
+            - on_finish: function
+                Called with the job and its finished SortPipeline
+                whenever a job finishes.
+        '''
+        self.controller = controller
+        self.on_finish = on_finish
+        self.jobs = get_jobs()
+        self.running = dict()
+        self.disk_slots = threading.BoundedSemaphore(disk_slots)
+        self.browser_slots = threading.BoundedSemaphore(browser_slots)
+
+    def add(self, job):
+        '''
+        This function adds a job to the end of the queue.
+        '''
+        self.jobs.append(job)
+        post_jobs(self.jobs)
+
+    def remove(self, job_id):
+        '''
+        This function removes a job that is not running.
+
+        Returns:
+            True if the job was removed, False otherwise.
+        '''
+        if job_id in self.running:
+            return False
+        self.jobs = [job for job in self.jobs if job["id"] != job_id]
+        post_jobs(self.jobs)
+        return True
+
+    def set_priority(self, job_id, priority):
+        '''
+        This function changes the priority of a job.
+        '''
+        for job in self.jobs:
+            if job["id"] == job_id:
+                job["priority"] = priority
+        post_jobs(self.jobs)
+
+    def get_progress(self, job):
+        '''
+        This function returns a short description of a job's
+        progress for display.
+        '''
+        pipeline = self.running.get(job["id"])
+        if pipeline:
+            return pipeline.get_progress()
+        return job.get("result", "")
+
+    def is_busy(self):
+        '''
+        This function returns True while any job is running.
+        '''
+        return len(self.running) > 0
+
+    def tick(self, cookies=None):
+        '''
+        This function finishes the jobs whose pipelines are done,
+        then starts queued jobs in order of priority while their
+        kind of job has room. To be called regularly from the
+        Tk main loop.
+
+        Parameters:
+            - cookies: List[dict]
+                The login cookies returned by get_login. If None,
+                jobs fetching surveys queue them for later instead.
+        '''
+        changed = False
+        jobs_by_id = {job["id"]: job for job in self.jobs}
+        for job_id, pipeline in list(self.running.items()):
+            if pipeline.is_running():
+                continue
+            del self.running[job_id]
+            job = jobs_by_id.get(job_id)
+            if job:
+                job["status"] = "done"
+                job["result"] = pipeline.get_progress()
+                self.on_finish(job, pipeline)
+            changed = True
+        running_kinds = [jobs_by_id[job_id]["options"]["surveys"] for job_id in self.running if job_id in jobs_by_id]
+        survey_count = running_kinds.count(True)
+        local_count = running_kinds.count(False)
+        queued = sorted([job for job in self.jobs if job["status"] == "queued"], key=lambda job: -job["priority"])
+        for job in queued:
+            surveys = job["options"]["surveys"]
+            if surveys and survey_count >= max_survey_jobs:
+                continue
+            if not surveys and local_count >= max_local_jobs:
+                continue
+            changed = True
+            if not os.path.isdir(job["source"]) or not os.path.isdir(job["dest"]):
+                job["status"] = "failed"
+                job["result"] = "Input or output folder not found!"
+                continue
+            keys = [keypair[0] for keypair in job["halls"].values()]
+            dirs = [keypair[1] for keypair in job["halls"].values()]
+            if job["options"]["all_folders"]:
+                for dir in dirs:
+                    os.makedirs(os.sep.join([job["dest"], dir]), exist_ok=True)
+            pipeline = SortPipeline(job["source"], job["dest"], keys, dirs, cookies=cookies if surveys else None, controller=self.controller, disk_slots=self.disk_slots, browser_slots=self.browser_slots)
+            pipeline.start()
+            self.running[job["id"]] = pipeline
+            job["status"] = "running"
+            if surveys:
+                survey_count += 1
+            else:
+                local_count += 1
+        if changed:
+            post_jobs(self.jobs)
@@ -1,4 +1,7 @@
+import multiprocessing
 import OrganizerTk
 
-main_window = OrganizerTk.Organizer()
-main_window.start()
\ No newline at end of file
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main_window = OrganizerTk.Organizer()
+    main_window.start()
\ No newline at end of file
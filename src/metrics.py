@@ -0,0 +1,162 @@
+import threading
+from bisect import bisect_left
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+prefix = "file_organizer_"
+default_port = 9464
+buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+lock = threading.Lock()
+counters = dict()
+histograms = dict()
+gauges = dict()
+descriptions = {
+    "sorts_total": "Sorts started.",
+    "files_scanned_total": "Files parsed from the input folder.",
+    "files_sorted_total": "Files moved into an applicant folder.",
+    "bad_keys_total": "Files with no dining hall.",
+    "duplicates_total": "Files not moved because the applicant already has hiring documents.",
+    "move_failures_total": "Files that could not be moved because of an error, such as a locked file.",
+    "rename_seconds": "Time taken to create the applicant folder and move a file.",
+    "surveys_fetched_total": "Scheduling Surveys saved.",
+    "survey_failures_total": "Scheduling Survey lookups that failed.",
+    "survey_fetch_seconds": "Time taken to look up and save a Scheduling Survey.",
+    "browser_launches_total": "Headless browsers launched for survey lookups.",
+    "browser_restarts_total": "Headless browsers closed after a failed lookup.",
+    "survey_worker_errors_total": "Survey threads stopped by an unexpected error.",
+    "parse_queue_depth": "Parsed files waiting to be moved.",
+    "survey_queue_depth": "Scheduling Surveys waiting to be looked up.",
+    "record_queue_depth": "Results waiting to be collected for the log."
+}
+server = None
+
+def inc(name, amount=1):
+    '''
+    This function adds to a counter, creating it if needed.
+
+    Parameters:
+        - name: str
+            The name of the counter, without the prefix.
+        - amount: int
+            The amount to add.
+    '''
+    with lock:
+        counters[name] = counters.get(name, 0) + amount
+
+def observe(name, value):
+    '''
+    This function records a value, such as a latency in
+    seconds, in a histogram, creating it if needed.
+
+    Parameters:
+        - name: str
+            The name of the histogram, without the prefix.
+        - value: float
+            The value to record.
+    '''
+    idx = bisect_left(buckets, value)
+    with lock:
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = [[0] * (len(buckets) + 1), 0.0, 0]
+        histogram[0][idx] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+def set_gauge(name, read):
+    '''
+    This function registers a gauge, whose value is only read
+    when the metrics are scraped. Passing None removes it.
+
+    Parameters:
+        - name: str
+            The name of the gauge, without the prefix.
+        - read: function
+            Called with no arguments to get the gauge's value.
+    '''
+    with lock:
+        if read is None:
+            gauges.pop(name, None)
+        else:
+            gauges[name] = read
+
+def render():
+    '''
+    This function returns every metric in the Prometheus
+    text exposition format.
+    '''
+    with lock:
+        counter_items = sorted(counters.items())
+        histogram_items = sorted([(name, [list(histogram[0]), histogram[1], histogram[2]]) for name, histogram in histograms.items()])
+        gauge_items = sorted(gauges.items())
+    lines = []
+    for name, value in counter_items:
+        lines.append(f"# HELP {prefix}{name} {descriptions.get(name, name)}")
+        lines.append(f"# TYPE {prefix}{name} counter")
+        lines.append(f"{prefix}{name} {value}")
+    for name, (counts, total, count) in histogram_items:
+        lines.append(f"# HELP {prefix}{name} {descriptions.get(name, name)}")
+        lines.append(f"# TYPE {prefix}{name} histogram")
+        cumulative = 0
+        for bound, bucket_count in zip(buckets + ["+Inf"], counts):
+            cumulative += bucket_count
+            lines.append(f'{prefix}{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{prefix}{name}_sum {total}")
+        lines.append(f"{prefix}{name}_count {count}")
+    for name, read in gauge_items:
+        try:
+            value = read()
+        except Exception:
+            continue
+        lines.append(f"# HELP {prefix}{name} {descriptions.get(name, name)}")
+        lines.append(f"# TYPE {prefix}{name} gauge")
+        lines.append(f"{prefix}{name} {value}")
+    return "\n".join(lines) + "\n"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    '''
+    This class answers requests to the metrics server.
+    Only the /metrics path is served.
+    '''
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(port=default_port, host="0.0.0.0"):
+    '''
+    This function starts serving the metrics over HTTP in a
+    background thread, if not already started.
+
+    Parameters:
+        - port: int
+            The port to serve the metrics on.
+        - host: str
+            The address to listen on. Defaults to every
+            address, so other machines can scrape the metrics.
+    '''
+    global server
+    if server:
+        return
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+def stop_server():
+    '''
+    This function stops serving the metrics, if started.
+    '''
+    global server
+    if not server:
+        return
+    server.shutdown()
+    server.server_close()
+    server = None
@@ -0,0 +1,152 @@
+import os
+import re
+import math
+import unicodedata
+
+def normalize_name(name):
+    '''
+    This function returns the key used to compare applicant
+    names, ignoring casing, accents, punctuation and spacing.
+
+    Parameters:
+        - name: str
+            The applicant name to normalize.
+    '''
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join([char for char in decomposed if not unicodedata.combining(char)])
+    stripped = re.sub(r"[^\w\s]", " ", stripped.casefold())
+    return " ".join(stripped.split())
+
+def get_trigrams(key):
+    '''
+    This function returns the set of character trigrams
+    for a normalized key, padded so that the start and
+    end of the name are weighted.
+
+    Parameters:
+        - key: str
+            The normalized name to split into trigrams.
+    '''
+    padded = f"  {key} "
+    return {padded[idx:idx+3] for idx in range(len(padded) - 2)}
+
+class ApplicantIndex():
+    '''
+    This class indexes the applicant folders already present
+    in each hall folder of the output folder, so that new files
+    can be matched against existing applicants without walking
+    the output folder for every file.
+
+    Names are compared by their normalized key first. If no
+    exact match exists, a trigram index is used to find the
+    most similar existing folder name.
+    '''
+    def __init__(self, threshold=0.7):
+        '''
+        Parameters:
+            - threshold: float
+                The minimum Dice similarity (0 to 1) between
+                two names' trigrams for them to be flagged as
+                a likely match.
+        '''
+        self.threshold = threshold
+        self.folders = dict()
+        self.grams = dict()
+        self.postings = dict()
+
+    def load_hall(self, hall_path, hall_dir):
+        '''
+        This function indexes the applicant folders inside a
+        hall folder. Halls are only scanned the first time they
+        are loaded.
+
+        Parameters:
+            - hall_path: str
+                The path to the hall folder.
+            - hall_dir: str
+                The name of the hall folder, used to scope lookups.
+        '''
+        if hall_dir in self.folders:
+            return
+        self.folders[hall_dir] = dict()
+        self.grams[hall_dir] = dict()
+        self.postings[hall_dir] = dict()
+        if not os.path.isdir(hall_path):
+            return
+        with os.scandir(hall_path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    self.add(hall_dir, entry.name)
+
+    def add(self, hall_dir, folder_name):
+        '''
+        This function adds an applicant folder to the index.
+
+        Parameters:
+            - hall_dir: str
+                The name of the hall folder the applicant is in.
+            - folder_name: str
+                The name of the applicant folder.
+        '''
+        key = normalize_name(folder_name)
+        folders = self.folders.setdefault(hall_dir, dict())
+        if not key or key in folders:
+            return
+        folders[key] = folder_name
+        grams = get_trigrams(key)
+        self.grams.setdefault(hall_dir, dict())[key] = grams
+        postings = self.postings.setdefault(hall_dir, dict())
+        for gram in grams:
+            postings.setdefault(gram, set()).add(key)
+
+    def find_exact(self, hall_dir, name):
+        '''
+        This function returns the existing folder name whose
+        normalized key is the same as the given name, or None
+        if no such folder exists.
+
+        Parameters:
+            - hall_dir: str
+                The name of the hall folder to search.
+            - name: str
+                The applicant name to look up.
+        '''
+        return self.folders.get(hall_dir, dict()).get(normalize_name(name))
+
+    def find_similar(self, hall_dir, name):
+        '''
+        This function returns the most similar existing folder
+        name and its similarity score as a tuple, or None if no
+        folder reaches the threshold. Exact key matches are not
+        returned, see find_exact.
+
+        Only the rarest trigrams of the name are used to gather
+        candidates, since any folder reaching the threshold must
+        share at least one of them.
+
+        Parameters:
+            - hall_dir: str
+                The name of the hall folder to search.
+            - name: str
+                The applicant name to look up.
+        '''
+        key = normalize_name(name)
+        postings = self.postings.get(hall_dir)
+        if not key or not postings:
+            return None
+        grams = get_trigrams(key)
+        min_overlap = math.ceil(self.threshold * len(grams) / (2 - self.threshold))
+        probe_count = len(grams) - min_overlap + 1
+        probes = sorted(grams, key=lambda gram: len(postings.get(gram, ())))[:probe_count]
+        candidates = set()
+        for gram in probes:
+            candidates.update(postings.get(gram, ()))
+        candidates.discard(key)
+        best = None
+        known_grams = self.grams[hall_dir]
+        for candidate in candidates:
+            other = known_grams[candidate]
+            score = 2 * len(grams & other) / (len(grams) + len(other))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (self.folders[hall_dir][candidate], score)
+        return best
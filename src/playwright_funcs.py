@@ -1,11 +1,46 @@
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import sync_playwright, Error as PlaywrightError
 import http.client as httplib
+import os
+from urllib.parse import urlsplit
+import queue, threading, time, traceback
+from rate_control import RateController
+import metrics
 
 mslink = "https://forms.office.com/Pages/DesignPageV2.aspx?" + \
          "origin=NeoPortalPage&subpage=design&id=hGiVYK0Q-" + \
          "kCGPU8yweOjemYNbVVriiJHgFdevpzMcOZUNDMwWVlPTkdYOD" + \
          "A1RFRUMUs4VkFTRTgwSSQlQCN0PWcu&analysis=true"
+mslink = os.environ.get("FILE_ORGANIZER_FORMS_URL", mslink)
 cookies = None
+browser_idle_timeout = 10
+response_timeout = 15000
+render_delay = 200
+response_url_part = "response"
+loading_text = "Loading..."
+
+class SurveyError(Exception):
+    '''
+    This class is raised when a Scheduling Survey lookup
+    reaches the page, but the page shows an error or never
+    shows the response, such as when Microsoft Forms throttles
+    the lookups.
+    '''
+    pass
+
+def set_forms_url(url):
+    '''
+    This function points every lookup at a different copy of
+    the Microsoft Forms results page, such as a FormsStub.
+    The login cookies are cleared, since they belong to the
+    previous page.
+
+    Parameters:
+        - url: str
+            The url of the results page.
+    '''
+    global mslink, cookies
+    mslink = url
+    cookies = None
 
 def check_connection():
     '''
@@ -15,7 +50,11 @@ def check_connection():
         True if a successful network connection is
         established, False otherwise.
     '''
-    conn = httplib.HTTPSConnection("8.8.8.8", timeout=5)
+    url = urlsplit(mslink)
+    if url.hostname in ("127.0.0.1", "localhost"):
+        conn = httplib.HTTPConnection(url.hostname, url.port, timeout=5)
+    else:
+        conn = httplib.HTTPSConnection("8.8.8.8", timeout=5)
     try:
         conn.request("HEAD", "/")
         return True
@@ -30,6 +69,10 @@ def get_login():
     page needed to run the rest of the playwright
     functions, which are used to grab and download
     the PDFs of the Scheduling Surveys.
+
+    Returns:
+        The login cookies, which may be an empty list if the
+        page needs no login, or None if the login failed.
     '''
     global cookies
     try:
@@ -37,7 +80,6 @@ def get_login():
             login_browser = pw.chromium.launch(headless=False)
             p = login_browser.new_page()
             p.goto(mslink)
-            p.wait_for_event('load')
             while p.url != mslink:
                 p.wait_for_timeout(5000)
             cookies = p.context.cookies()
@@ -64,6 +106,12 @@ def get_survey(page, ssid, save_path, *, new_navigation = False, prev_ssids = [3
     via the provided Scheduling Survey ID (ssid),
     and saves the page as a PDF at the path given.
 
+    After the number is typed, the page's request for the
+    response is waited for, for up to response_timeout ms. The
+    PDF is only saved if that request succeeded and the page is
+    no longer loading, so that a throttled or failed lookup never
+    saves an error page as the survey.
+
     Parameters:
         - page: playwright.sync_api.Page
             The page which is navigated to the
@@ -79,11 +127,228 @@ def get_survey(page, ssid, save_path, *, new_navigation = False, prev_ssids = [3
         - prev_ssids: List[int]
             The list of ssids searched up. Defaults
             to the initial search ID, which is 3.
+
+    Returns:
+        The time in seconds taken for the response to arrive.
+
+    Raises:
+        SurveyError if the response failed, such as with a 429
+        error when throttled, or the page is still loading.
+        playwright.sync_api.TimeoutError if no response arrived.
     '''
-    if new_navigation:
-        page.fill(f"input[value='{prev_ssids[0]}']", f"{ssid}")
-    else:
-        page.fill(f"input[value='{prev_ssids[-1]}']", f"{ssid}")
-    page.wait_for_timeout(600)
-    prev_ssids.append(ssid)
-    page.pdf(path=save_path)
\ No newline at end of file
+    selector = f"input[value='{prev_ssids[0] if new_navigation else prev_ssids[-1]}']"
+    start = time.monotonic()
+    with page.expect_response(lambda response: response_url_part in response.url.lower() and response.request.resource_type in ("fetch", "xhr"), timeout=response_timeout) as response_info:
+        page.fill(selector, f"{ssid}")
+        prev_ssids.append(ssid)
+    response = response_info.value
+    latency = time.monotonic() - start
+    if not response.ok:
+        raise SurveyError(f"Response {ssid} failed with status {response.status}")
+    page.wait_for_timeout(render_delay)
+    if page.get_by_text(loading_text, exact=True).count():
+        raise SurveyError(f"Response {ssid} did not finish loading")
+    page.pdf(path=save_path)
+    return latency
+
+def _survey_worker(cookies, jobs, results, controller, stopped, browser_slots=None):
+    '''
+    This function runs in its own thread, with its own browser,
+    looking up Scheduling Surveys from the jobs queue until it
+    takes None from the queue. Each lookup waits for the controller
+    first. The browser is only launched once the first lookup is
+    allowed, and only the wait for the response is timed for the
+    controller, so starting a browser or saving the PDF is never
+    mistaken for a slow lookup. A lookup showing an error or still
+    loading counts as failed, so throttling slows the lookups down. A
+    browser that fails to start leaves the controller's limits
+    unchanged. Once the network connection is lost or the browser
+    cannot be started, the remaining jobs are failed without
+    being looked up, so the jobs queue never stops draining.
+
+    Parameters:
+        - cookies: List[dict]
+            The login cookies returned by get_login.
+        - jobs: queue.Queue
+            The queue of (ssid, save_path) pairs to look up.
+        - results: queue.Queue
+            The queue to put ((ssid, save_path), succeeded) pairs into.
+        - controller: RateController
+            The controller pacing the lookups.
+        - stopped: threading.Event
+            Set when the network connection is lost, to stop
+            every worker.
+        - browser_slots: threading.Semaphore
+            If provided, a slot is held for as long as this
+            worker's browser is open, and the browser is closed
+            once no job has arrived for browser_idle_timeout
+            seconds, so that browsers can be shared between
+            several sorts.
+    '''
+    finished = False
+    holding = False
+    try:
+        with sync_playwright() as pw:
+            browser = None
+            while True:
+                try:
+                    job = jobs.get(timeout=browser_idle_timeout if browser and browser_slots else None)
+                except queue.Empty:
+                    browser.close()
+                    browser = None
+                    browser_slots.release()
+                    holding = False
+                    continue
+                if job is None:
+                    finished = True
+                    break
+                if stopped.is_set():
+                    results.put((job, False))
+                    continue
+                if browser_slots and not holding:
+                    browser_slots.acquire()
+                    holding = True
+                controller.acquire()
+                if stopped.is_set():
+                    controller.cancel()
+                    results.put((job, False))
+                    continue
+                ssid, save_path = job
+                ok = False
+                start = None
+                latency = None
+                try:
+                    if not browser:
+                        browser = pw.chromium.launch(headless=True)
+                        metrics.inc("browser_launches_total")
+                        p = browser.new_page()
+                        p.context.add_cookies(cookies)
+                        navigate_to_results(p)
+                        prev_ssids = [3]
+                        first_nav = True
+                    start = time.monotonic()
+                    first = first_nav
+                    first_nav = False
+                    latency = get_survey(p, ssid, save_path, new_navigation=first, prev_ssids=prev_ssids)
+                    ok = True
+                    metrics.inc("surveys_fetched_total")
+                except SurveyError:
+                    metrics.inc("survey_failures_total")
+                except PlaywrightError:
+                    metrics.inc("survey_failures_total")
+                    if not check_connection():
+                        stopped.set()
+                    elif browser:
+                        metrics.inc("browser_restarts_total")
+                        browser.close()
+                        browser = None
+                finally:
+                    if start is None:
+                        controller.cancel()
+                    else:
+                        if latency is None:
+                            latency = time.monotonic() - start
+                        metrics.observe("survey_fetch_seconds", latency)
+                        controller.release(latency, ok)
+                    results.put((job, ok))
+                if holding and not browser:
+                    browser_slots.release()
+                    holding = False
+            if browser:
+                browser.close()
+    except PlaywrightError:
+        pass
+    except Exception:
+        metrics.inc("survey_worker_errors_total")
+        traceback.print_exc()
+    if holding:
+        browser_slots.release()
+    while not finished:
+        job = jobs.get()
+        if job is None:
+            break
+        results.put((job, False))
+
+def start_survey_workers(cookies, jobs, results, controller, count, browser_slots=None):
+    '''
+    This function starts the threads looking up Scheduling
+    Surveys from the jobs queue. Put one None into the jobs
+    queue per worker to stop them once every job is queued.
+
+    Parameters:
+        - cookies: List[dict]
+            The login cookies returned by get_login.
+        - jobs: queue.Queue
+            The queue of (ssid, save_path) pairs to look up.
+        - results: queue.Queue
+            The queue to put ((ssid, save_path), succeeded) pairs into.
+        - controller: RateController
+            The controller pacing the lookups.
+        - count: int
+            The number of threads to start.
+        - browser_slots: threading.Semaphore
+            If provided, limits how many browsers are open at
+            once, across every sort sharing the semaphore.
+
+    Returns:
+        The list of started threads.
+    '''
+    stopped = threading.Event()
+    workers = []
+    for _ in range(count):
+        worker = threading.Thread(target=_survey_worker, args=(cookies, jobs, results, controller, stopped, browser_slots), daemon=True)
+        worker.start()
+        workers.append(worker)
+    return workers
+
+def get_surveys(cookies, surveys, on_progress=None, controller=None, browser_slots=None):
+    '''
+    This function saves each of the given Scheduling Surveys as
+    a PDF, using several headless browsers at once. The number
+    of lookups in flight and the time between them are decided
+    by the controller. A failed lookup does not stop the remaining
+    lookups, unless the network connection has been lost, in which
+    case every remaining survey fails.
+
+    Parameters:
+        - cookies: List[dict]
+            The login cookies returned by get_login.
+        - surveys: List[Tuple[int, str]]
+            The (ssid, save_path) pairs to look up.
+        - on_progress: function
+            Called regularly from the calling thread with the
+            number of surveys attempted so far, if provided.
+        - controller: RateController
+            The controller pacing the lookups. A new one with
+            the default limits is used if not provided.
+        - browser_slots: threading.Semaphore
+            If provided, limits how many browsers are open at
+            once, shared with any sorts running at the same time.
+
+    Returns:
+        A tuple of two lists, the save paths of the surveys
+        that were saved and the save paths of those that failed.
+    '''
+    controller = controller or RateController()
+    jobs = queue.Queue()
+    results = queue.Queue()
+    count = min(controller.ceiling, len(surveys))
+    for survey in surveys:
+        jobs.put(survey)
+    for _ in range(count):
+        jobs.put(None)
+    workers = start_survey_workers(cookies, jobs, results, controller, count, browser_slots)
+    fetched = []
+    failed = []
+    while any([worker.is_alive() for worker in workers]) or not results.empty():
+        try:
+            (_, save_path), ok = results.get(timeout=0.2)
+            if ok:
+                fetched.append(save_path)
+            else:
+                failed.append(save_path)
+        except queue.Empty:
+            pass
+        if on_progress:
+            on_progress(len(fetched) + len(failed))
+    return fetched, failed
\ No newline at end of file
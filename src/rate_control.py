@@ -0,0 +1,107 @@
+import time, threading
+
+min_workers = 1
+max_workers = 4
+min_interval = 0.0
+max_interval = 10.0
+target_latency = 4.0
+
+class RateController():
+    '''
+    This class paces the Scheduling Survey lookups sent to
+    Microsoft Forms, using additive increase and multiplicative
+    decrease (AIMD).
+
+    Each lookup that finishes quickly allows slightly more
+    lookups in flight and slightly less time between the start
+    of each lookup. A failed or slow lookup halves the number
+    of lookups in flight and doubles the time between them.
+    '''
+    def __init__(self, floor=min_workers, ceiling=max_workers, min_gap=min_interval, max_gap=max_interval, target=target_latency):
+        '''
+        Parameters:
+            - floor: int
+                The fewest lookups allowed in flight.
+            - ceiling: int
+                The most lookups allowed in flight.
+            - min_gap: float
+                The shortest time in seconds between the start
+                of two lookups.
+            - max_gap: float
+                The longest time in seconds between the start
+                of two lookups.
+            - target: float
+                The lookup time in seconds above which Forms is
+                considered to be slowing down.
+        '''
+        self.floor = floor
+        self.ceiling = ceiling
+        self.min_gap = min_gap
+        self.max_gap = max_gap
+        self.target = target
+        self.limit = float(floor)
+        self.gap = min_gap
+        self.in_flight = 0
+        self.last_start = 0
+        self.last_decrease = 0
+        self.latency = 0
+        self.errors = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        '''
+        This function blocks until another lookup may start,
+        then counts it as in flight.
+        '''
+        with self.condition:
+            while True:
+                wait = self.last_start + self.gap - time.monotonic()
+                if self.in_flight < int(self.limit) and wait <= 0:
+                    break
+                self.condition.wait(wait if wait > 0 else None)
+            self.in_flight += 1
+            self.last_start = time.monotonic()
+
+    def release(self, latency, ok):
+        '''
+        This function marks a lookup as finished, and adjusts
+        the limit and the gap between lookups based on how it went.
+
+        Parameters:
+            - latency: float
+                The time in seconds the lookup took.
+            - ok: bool
+                True if the lookup succeeded, False otherwise.
+        '''
+        with self.condition:
+            self.in_flight -= 1
+            self.latency = latency if not self.latency else 0.8 * self.latency + 0.2 * latency
+            now = time.monotonic()
+            if not ok or latency > self.target:
+                if not ok:
+                    self.errors += 1
+                if now - self.last_decrease > latency:
+                    self.limit = max(float(self.floor), self.limit / 2)
+                    self.gap = min(self.max_gap, max(self.gap * 2, 0.5))
+                    self.last_decrease = now
+            else:
+                self.limit = min(float(self.ceiling), self.limit + 1 / self.limit)
+                self.gap = max(self.min_gap, self.gap / 2 if self.gap > 0.1 else self.min_gap)
+            self.condition.notify_all()
+
+    def cancel(self):
+        '''
+        This function marks a lookup that was allowed to start
+        but never ran as finished, without adjusting the limits.
+        '''
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def get_state(self):
+        '''
+        This function returns a short description of the
+        controller's current state for the status label.
+        '''
+        with self.condition:
+            return f"{int(self.limit)} at once, {self.gap:.1f}s apart, {self.latency:.1f}s each, {self.errors} errors"
@@ -0,0 +1,109 @@
+import os, json, time, random
+import save_handler as saves
+
+queue_file = f"{saves.save_folder}/survey_queue.json"
+base_delay = 30
+max_delay = 3600
+
+def get_queue():
+    '''
+    This function retrieves the list of Scheduling Surveys
+    waiting to be fetched.
+    '''
+    if not os.path.exists(queue_file):
+        return []
+    with open(queue_file, 'r', encoding='utf-8') as in_file:
+        return json.load(in_file)
+
+def post_queue(entries):
+    '''
+    This function saves the list of Scheduling Surveys waiting
+    to be fetched. The list is written to a temporary file first
+    so an interrupted write never loses the queue.
+
+    Parameters:
+        - entries: List[dict]
+            The queued surveys, as returned by get_queue.
+    '''
+    tmp_file = f"{queue_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as out_file:
+        json.dump(entries, out_file, ensure_ascii=False, indent=4)
+    os.replace(tmp_file, queue_file)
+
+def add_surveys(surveys):
+    '''
+    This function adds Scheduling Surveys to the queue, to be
+    fetched as soon as possible. Surveys already queued for the
+    same save path are not added twice.
+
+    Parameters:
+        - surveys: List[Tuple[int, str]]
+            The (ssid, save_path) pairs to queue.
+    '''
+    if not surveys:
+        return
+    entries = get_queue()
+    queued_paths = {entry["save_path"] for entry in entries}
+    for ssid, save_path in surveys:
+        if save_path in queued_paths:
+            continue
+        entries.append({"ssid": ssid, "save_path": save_path, "attempts": 0, "next_attempt": 0})
+        queued_paths.add(save_path)
+    post_queue(entries)
+
+def get_backoff(attempts):
+    '''
+    This function returns the number of seconds to wait before
+    the next attempt, using exponential backoff with full jitter.
+
+    Parameters:
+        - attempts: int
+            The number of failed attempts so far.
+    '''
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempts))
+
+def get_due(force=False):
+    '''
+    This function returns the queued surveys whose backoff
+    has elapsed.
+
+    Parameters:
+        - force: bool
+            If True, every queued survey is returned regardless
+            of its backoff.
+    '''
+    now = time.time()
+    return [entry for entry in get_queue() if force or entry["next_attempt"] <= now]
+
+def get_next_delay():
+    '''
+    This function returns the number of seconds until the next
+    queued survey is due, or None if the queue is empty.
+    '''
+    entries = get_queue()
+    if not entries:
+        return None
+    return max(0, min([entry["next_attempt"] for entry in entries]) - time.time())
+
+def post_results(fetched, failed):
+    '''
+    This function removes the fetched surveys from the queue
+    and schedules the next attempt for the failed ones.
+
+    Parameters:
+        - fetched: List[str]
+            The save paths of the surveys fetched successfully.
+        - failed: List[str]
+            The save paths of the surveys that failed again.
+    '''
+    fetched = set(fetched)
+    failed = set(failed)
+    entries = []
+    for entry in get_queue():
+        if entry["save_path"] in fetched:
+            continue
+        if entry["save_path"] in failed:
+            entry["attempts"] += 1
+            entry["next_attempt"] = time.time() + get_backoff(entry["attempts"])
+        entries.append(entry)
+    post_queue(entries)
@@ -0,0 +1,326 @@
+import os, re, queue, threading, time, zlib
+import playwright_funcs as pwfuncs
+import metrics
+from name_index import ApplicantIndex
+from rate_control import RateController
+
+queue_size = 64
+ssid_pattern = r"\s+\d+\s+"
+
+def get_sort_details(filename, keys):
+    '''
+    This function returns a list of details used
+    to sort the provided file based on the filename.
+
+    Parameters:
+        - filename: str
+            The name of the file to be sorted.
+        - keys: List[str]
+            The list of possible keys used to
+            identify the dining hall the file
+            should be sorted to.
+
+    Returns:
+        If a valid key is in the filename, one
+        of two types of lists can be returned:
+            - If a SSID is found, a 3-elem list
+              is returned.
+            - If no SSID matches are found, a
+              2-elem list is returned.
+        If no valid key is found in the filename,
+        the filename is returned as a 1-elem list
+        containing only the filename.
+    '''
+    file_no_ext = filename[:-4].strip()
+    if not any([file_no_ext.endswith(key) for key in keys]):
+        return [filename]
+    ssid_matches = re.findall(ssid_pattern, file_no_ext)
+    if len(ssid_matches) > 0:
+        details = file_no_ext.split(ssid_matches[0])
+        details.insert(1, int(ssid_matches[0]))
+        return details
+    else:
+        for key in keys:
+            if file_no_ext.endswith(key):
+                name = file_no_ext[:-len(key)].strip()
+                return [name, key]
+
+class SortPipeline():
+    '''
+    This class sorts the files of an input folder into the
+    output folder as a pipeline of stages, each in its own
+    thread and connected by queues:
+
+    1. Scanning lists the input folder and parses each filename.
+    2. Moving creates the applicant folders and moves the files.
+    3. Fetching looks up the Scheduling Surveys, with several
+       browser threads paced by a RateController.
+    4. Collecting gathers the results of the other stages for
+       the log file.
+
+    The queues between local stages are bounded, so scanning
+    cannot run far ahead of moving. The queue of surveys is not,
+    so moving files never waits for the survey lookups.
+    '''
+    def __init__(self, source, dest, keys, dirs, cookies=None, controller=None, claims=None, disk_slots=None, browser_slots=None, await_login=False):
+        '''
+        Parameters:
+            - source: str
+                The input folder to sort.
+            - dest: str
+                The output folder to sort into.
+            - keys: List[str]
+                The key phrases identifying each dining hall.
+            - dirs: List[str]
+                The folder names of each dining hall, in the
+                same order as the keys.
+            - cookies: List[dict]
+                The login cookies returned by get_login. If None,
+                no surveys are fetched, and every survey is listed
+                as missed.
+            - controller: RateController
+                The controller pacing the survey lookups. A new
+                one with the default limits is used if not provided.
+            - claims: ClaimManager
+                If provided, each file is claimed before it is
+                moved, for input folders shared by several
+                workstations. The manager must already be started.
+            - disk_slots: threading.Semaphore
+                If provided, a slot is held while each file is
+                moved, to limit disk use across several sorts.
+            - browser_slots: threading.Semaphore
+                If provided, limits how many browsers are open
+                at once across several sorts.
+            - await_login: bool
+                If True, the cookies are given later through
+                set_cookies, and surveys are held until then, so
+                files are moved while the user logs in.
+        '''
+        self.source = source
+        self.dest = dest
+        self.keys = keys
+        self.dirs = dirs
+        self.cookies = cookies
+        self.controller = controller or RateController()
+        self.claims = claims
+        self.disk_slots = disk_slots
+        self.browser_slots = browser_slots
+        self.await_login = await_login
+        self.logged_in = threading.Event()
+        self.results = {"sorted": [], "bad": [], "dupes": [], "failed": [], "similar": [], "missed": [], "unverified": []}
+        self.latest = dict()
+        self.scanned = 0
+        self.moved = 0
+        self.surveys_queued = 0
+        self.surveys_done = 0
+        self.survey_paths = set()
+        self.threads = []
+
+    def start(self):
+        '''
+        This function starts every stage of the pipeline.
+        '''
+        self.parsed = queue.Queue(maxsize=queue_size)
+        self.surveys = queue.Queue()
+        self.records = queue.Queue(maxsize=queue_size)
+        metrics.inc("sorts_total")
+        metrics.set_gauge("parse_queue_depth", self.parsed.qsize)
+        metrics.set_gauge("survey_queue_depth", self.surveys.qsize)
+        metrics.set_gauge("record_queue_depth", self.records.qsize)
+        self.survey_workers = []
+        if not self.await_login:
+            self.set_cookies(self.cookies)
+        for stage in [self._scan, self._move, self._collect]:
+            thread = threading.Thread(target=stage, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def set_cookies(self, cookies):
+        '''
+        This function starts the survey threads with the given
+        login cookies, releasing the surveys held while waiting
+        for the login. If None, every survey is listed as missed.
+
+        Parameters:
+            - cookies: List[dict]
+                The login cookies returned by get_login.
+        '''
+        self.cookies = cookies
+        if self.cookies is not None:
+            self.survey_workers = pwfuncs.start_survey_workers(self.cookies, self.surveys, self.records, self.controller, self.controller.ceiling, self.browser_slots)
+        self.logged_in.set()
+
+    def is_running(self):
+        '''
+        This function returns True until every stage has finished.
+        '''
+        return any([thread.is_alive() for thread in self.threads])
+
+    def _scan(self):
+        '''
+        The scanning stage. When the input folder is shared, each
+        workstation starts at a different point in the file list
+        so that they rarely compete for the same file.
+        '''
+        try:
+            pdf_files = sorted([filename for filename in os.listdir(self.source) if filename.endswith(".pdf")])
+            if self.claims and pdf_files:
+                offset = zlib.crc32(self.claims.worker_id.encode()) % len(pdf_files)
+                pdf_files = pdf_files[offset:] + pdf_files[:offset]
+            for filename in pdf_files:
+                self.parsed.put((filename, get_sort_details(filename, self.keys)))
+                self.scanned += 1
+                metrics.inc("files_scanned_total")
+        finally:
+            self.parsed.put(None)
+
+    def _move(self):
+        '''
+        The moving stage. A file that cannot be moved because of
+        an unexpected error is listed as failed, and the next file
+        is moved. Once every file is moved, the survey threads are
+        stopped and the collecting stage is told that no more
+        results are coming.
+        '''
+        applicants = ApplicantIndex()
+        item = None
+        try:
+            while True:
+                item = self.parsed.get()
+                if item is None:
+                    break
+                filename, sort_details = item
+                try:
+                    if self.disk_slots:
+                        with self.disk_slots:
+                            survey = self._move_file(filename, sort_details, applicants)
+                    else:
+                        survey = self._move_file(filename, sort_details, applicants)
+                except Exception as error:
+                    metrics.inc("move_failures_total")
+                    self.records.put(("failed", [filename, str(error)]))
+                    survey = None
+                if survey:
+                    self.surveys_queued += 1
+                    self.surveys.put(survey)
+                self.moved += 1
+        finally:
+            while item is not None:
+                item = self.parsed.get()
+            self.logged_in.wait()
+            for _ in self.survey_workers:
+                self.surveys.put(None)
+            for worker in self.survey_workers:
+                worker.join()
+            while not self.survey_workers and not self.surveys.empty():
+                self.records.put(("missed", list(self.surveys.get())))
+            self.records.put(None)
+
+    def _move_file(self, filename, sort_details, applicants):
+        '''
+        This function moves a single file into its applicant
+        folder.
+
+        Parameters:
+            - filename: str
+                The name of the file in the input folder.
+            - sort_details: List
+                The details returned by get_sort_details.
+            - applicants: ApplicantIndex
+                The index of existing applicant folders.
+
+        Returns:
+            The (ssid, save_path) pair of the file's Scheduling
+            Survey if it should be looked up, None otherwise.
+        '''
+        if len(sort_details) == 1 or sort_details[-1] not in self.keys:
+            metrics.inc("bad_keys_total")
+            self.records.put(("bad", filename))
+            return None
+        if self.claims:
+            if not self.claims.claim(filename):
+                return None
+            if not os.path.exists(os.sep.join([self.source, filename])) or not self.claims.holds(filename):
+                self.claims.release(filename)
+                return None
+        survey = None
+        start = time.monotonic()
+        try:
+            hall_dir = self.dirs[self.keys.index(sort_details[-1])]
+            dest_folder = os.sep.join([self.dest, hall_dir])
+            os.makedirs(dest_folder, exist_ok=True)
+            applicants.load_hall(dest_folder, hall_dir)
+            applicant_name = applicants.find_exact(hall_dir, sort_details[0])
+            if applicant_name:
+                sort_details[0] = applicant_name
+            else:
+                applicant_name = sort_details[0].strip()
+                similar = applicants.find_similar(hall_dir, applicant_name)
+                if similar:
+                    self.records.put(("similar", [filename, applicant_name, similar[0], round(similar[1], 2)]))
+                applicants.add(hall_dir, applicant_name)
+            applicant_folder = os.sep.join([dest_folder, applicant_name])
+            os.makedirs(applicant_folder, exist_ok=True)
+            target = os.sep.join([applicant_folder, f"{sort_details[0]} Hiring Documents.pdf"])
+            if os.path.exists(target):
+                metrics.inc("duplicates_total")
+                self.records.put(("dupes", filename))
+                return None
+            os.rename(os.sep.join([self.source, filename]), target)
+            metrics.observe("rename_seconds", time.monotonic() - start)
+            metrics.inc("files_sorted_total")
+            if len(sort_details) == 3:
+                survey = (sort_details[1], self._get_survey_path(applicant_folder, sort_details[0], sort_details[1]))
+                if self.logged_in.is_set() and not self.survey_workers:
+                    self.records.put(("missed", list(survey)))
+                    survey = None
+            else:
+                sort_details.insert(1, -1)
+            self.records.put(("sorted", sort_details))
+            self.latest.setdefault(hall_dir, set()).add(applicant_name)
+        except OSError as error:
+            metrics.inc("move_failures_total")
+            self.records.put(("failed", [filename, str(error)]))
+        finally:
+            if self.claims:
+                self.claims.release(filename)
+        return survey
+
+    def _get_survey_path(self, applicant_folder, applicant_name, ssid):
+        '''
+        This function returns the path to save a Scheduling Survey
+        to. If another survey already uses the usual path, the
+        survey number is added to the name, so that two applicants
+        sharing a folder never overwrite each other's survey.
+        '''
+        save_path = os.sep.join([applicant_folder, f"{applicant_name} Scheduling Survey.pdf"])
+        if save_path in self.survey_paths or os.path.exists(save_path):
+            save_path = os.sep.join([applicant_folder, f"{applicant_name} Scheduling Survey {ssid}.pdf"])
+        self.survey_paths.add(save_path)
+        return save_path
+
+    def _collect(self):
+        '''
+        The collecting stage. Survey results arrive as
+        ((ssid, save_path), succeeded) pairs from the survey
+        threads, and every other result as (sheet, row) pairs
+        from the moving stage.
+        '''
+        while True:
+            record = self.records.get()
+            if record is None:
+                break
+            sheet, row = record
+            if isinstance(sheet, tuple):
+                self.surveys_done += 1
+                if not row:
+                    self.results["missed"].append(list(sheet))
+            else:
+                self.results[sheet].append(row)
+
+    def get_progress(self):
+        '''
+        This function returns a short description of the
+        pipeline's progress for the status label.
+        '''
+        return f"Scanned {self.scanned}, moved {self.moved}, surveys {self.surveys_done}/{self.surveys_queued}"
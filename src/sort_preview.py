@@ -0,0 +1,122 @@
+import re
+from bisect import bisect_left
+from sort_pipeline import ssid_pattern
+
+class SortPreview():
+    '''
+    This class predicts which dining hall each file of an
+    input folder would be sorted into, following the same
+    rules as get_sort_details, without moving any files.
+
+    The filenames are parsed once. Files with a Scheduling
+    Survey number are grouped by the text after the number,
+    which must be a key phrase. Files without one are indexed
+    by their reversed name, so the files ending with a key phrase
+    can be found by binary search. When the key phrases change,
+    only the files ending with an added key phrase or sorted by
+    a removed key phrase are checked again.
+    '''
+    def __init__(self, filenames):
+        '''
+        Parameters:
+            - filenames: List[str]
+                The names of the PDF files in the input folder.
+        '''
+        self.by_tail = dict()
+        self.plain = []
+        for filename in filenames:
+            file_no_ext = filename[:-4].strip()
+            ssid_matches = re.findall(ssid_pattern, file_no_ext)
+            if len(ssid_matches) > 0:
+                tail = file_no_ext.split(ssid_matches[0])[-1]
+                self.by_tail.setdefault(tail, []).append(filename)
+            else:
+                self.plain.append(filename)
+        self.reversed = sorted([(filename[:-4].strip()[::-1], idx) for idx, filename in enumerate(self.plain)])
+        self.reversed_names = [name for name, _ in self.reversed]
+        self.assigned = [None] * len(self.plain)
+        self.members = dict()
+        self.unmatched = set(range(len(self.plain)))
+        self.keys = []
+
+    def _ending_with(self, key):
+        '''
+        This function returns the indices of the files without
+        a Scheduling Survey number whose names end with the key.
+        '''
+        prefix = key[::-1]
+        start = bisect_left(self.reversed_names, prefix)
+        indices = []
+        for name, idx in self.reversed[start:]:
+            if not name.startswith(prefix):
+                break
+            indices.append(idx)
+        return indices
+
+    def _assign(self, idx):
+        '''
+        This function sorts a file without a Scheduling Survey
+        number into the first key phrase its name ends with.
+        '''
+        old_key = self.assigned[idx]
+        if old_key is not None:
+            self.members.get(old_key, set()).discard(idx)
+        file_no_ext = self.plain[idx][:-4].strip()
+        new_key = None
+        for key in self.keys:
+            if file_no_ext.endswith(key):
+                new_key = key
+                break
+        self.assigned[idx] = new_key
+        if new_key is None:
+            self.unmatched.add(idx)
+        else:
+            self.unmatched.discard(idx)
+            self.members.setdefault(new_key, set()).add(idx)
+
+    def update(self, keys):
+        '''
+        This function updates the preview for a new list of
+        key phrases. Empty key phrases are ignored, and only the
+        first of any repeated key phrases is used, as in the sort.
+
+        Parameters:
+            - keys: List[str]
+                The key phrases, in the order of the hall settings.
+        '''
+        new_keys = []
+        for key in keys:
+            if key and key not in new_keys:
+                new_keys.append(key)
+        old_keys = self.keys
+        self.keys = new_keys
+        kept_old = [key for key in old_keys if key in new_keys]
+        kept_new = [key for key in new_keys if key in old_keys]
+        if kept_old != kept_new:
+            affected = range(len(self.plain))
+        else:
+            affected = set()
+            for key in set(old_keys) - set(new_keys):
+                affected.update(self.members.pop(key, set()))
+            for key in set(new_keys) - set(old_keys):
+                affected.update(self._ending_with(key))
+        for idx in affected:
+            self._assign(idx)
+
+    def get_counts(self):
+        '''
+        This function returns a dictionary of each key phrase
+        to the number of files that would be sorted with it.
+        '''
+        return {key: len(self.members.get(key, ())) + len(self.by_tail.get(key, ())) for key in self.keys}
+
+    def get_unmatched(self):
+        '''
+        This function returns the sorted list of files that
+        would be listed under "Dining Hall Not Found".
+        '''
+        unmatched = [self.plain[idx] for idx in self.unmatched]
+        for tail, filenames in self.by_tail.items():
+            if tail not in self.keys:
+                unmatched.extend(filenames)
+        return sorted(unmatched)
@@ -0,0 +1,117 @@
+import os, time, tempfile, argparse
+import playwright_funcs as pwfuncs
+from forms_stub import FormsStub, auth_cookie
+from sort_pipeline import SortPipeline
+from rate_control import RateController
+
+hall_key = "Stub Hall"
+
+def get_applicant_name(idx):
+    '''
+    This function returns a made up applicant name for the
+    given number. The name has no digits, so that the survey
+    number is the only number in the filename.
+    '''
+    letters = ""
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return f"Applicant {letters}"
+
+def make_input_folder(files):
+    '''
+    This function creates a temporary input folder with the
+    given number of DocuSign PDFs, each with its own survey
+    number.
+
+    Returns:
+        The path of the input folder.
+    '''
+    source = tempfile.mkdtemp()
+    for idx in range(files):
+        with open(os.sep.join([source, f"{get_applicant_name(idx)} {idx + 1} {hall_key}.pdf"]), 'wb') as out_file:
+            out_file.write(b"%PDF-1.4\n%%EOF\n")
+    return source
+
+def check_surveys(stub, dest, files):
+    '''
+    This function compares the surveys saved by a sort made with
+    time_sort against how the stand-in answered each lookup.
+
+    Returns:
+        A tuple of the number of surveys saved, and the list of
+        survey numbers that were saved even though the stand-in's
+        latest answer for them was a fault or throttling.
+    '''
+    saved = 0
+    faulted = []
+    for idx in range(files):
+        name = get_applicant_name(idx)
+        if not os.path.exists(os.sep.join([dest, hall_key, name, f"{name} Scheduling Survey.pdf"])):
+            continue
+        saved += 1
+        if stub.outcomes.get(idx + 1) != 200:
+            faulted.append(idx + 1)
+    return saved, faulted
+
+def time_sort(stub, files=100):
+    '''
+    This function sorts a temporary input folder against a
+    running FormsStub, fetching every survey from it, and
+    prints how long the sort took. Every saved survey is checked
+    against the stand-in's answer for it, so that a fault saved as
+    a survey is reported.
+
+    Parameters:
+        - stub: FormsStub
+            The started stand-in to fetch the surveys from.
+        - files: int
+            The number of files to sort.
+
+    Returns:
+        The list of survey numbers saved despite a fault.
+    '''
+    pwfuncs.set_forms_url(stub.url)
+    cookies = []
+    if stub.require_login:
+        name, value = auth_cookie.split("=")
+        cookies = [{"name": name, "value": value, "url": f"http://127.0.0.1:{stub.port}"}]
+    source = make_input_folder(files)
+    dest = tempfile.mkdtemp()
+    controller = RateController()
+    pipeline = SortPipeline(source, dest, [hall_key], [hall_key], cookies=cookies, controller=controller)
+    start = time.monotonic()
+    pipeline.start()
+    while pipeline.is_running():
+        time.sleep(1)
+        print(f"{time.monotonic() - start:.0f}s: {pipeline.get_progress()} - {controller.get_state()}")
+    elapsed = time.monotonic() - start
+    saved, faulted = check_surveys(stub, dest, files)
+    print(f"Sorted {len(pipeline.results['sorted'])} files and saved {saved} of {pipeline.surveys_queued} surveys in {elapsed:.1f}s ({saved / elapsed:.1f} surveys/s).")
+    print(f"{len(pipeline.results['missed'])} surveys were missed and would be queued for later.")
+    print(f"The stand-in answered {stub.lookups} lookups: {stub.throttled} throttled, {stub.errors} failed and {stub.timeouts} timed out.")
+    if faulted:
+        print(f"{len(faulted)} surveys were saved from a faulted lookup: {faulted[:20]}")
+    print(f"Output folder kept at {dest}")
+    return faulted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time a whole sort against a local stand-in for the Microsoft Forms results page.")
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--rate", type=float, default=None)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--require-login", action="store_true")
+    args = parser.parse_args()
+    stub = FormsStub(args.port, args.latency, args.jitter, args.rate, args.timeout_rate, args.timeout, args.error_rate, args.require_login)
+    stub.start()
+    try:
+        faulted = time_sort(stub, args.files)
+    finally:
+        stub.stop()
+    raise SystemExit(1 if faulted else 0)
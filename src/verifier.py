@@ -0,0 +1,202 @@
+import os, csv, mmap, hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+manifests_name = "Manifests"
+trailer_size = 1024
+max_workers = 8
+manifest_columns = ["File", "Size", "Modified", "SHA-256", "Problem"]
+
+def verify_file(path, previous=None, accept=False):
+    '''
+    This function checks that a PDF is complete, and returns
+    its manifest entry. The file is read through a memory map,
+    so its contents are never copied into memory at once.
+
+    If the previous entry for the file has the same size and
+    modified time, it is returned as is, without rehashing.
+    Otherwise, a checksum different from the previous entry's
+    is reported as a problem, and the previous checksum is kept
+    so that the file is still checked against it later. Only the
+    checksum of a file that passed every check is recorded, so a
+    truncated file that is fetched again is not reported as changed.
+
+    Parameters:
+        - path: str
+            The path of the PDF to check.
+        - previous: dict
+            The file's entry from an earlier manifest, if any.
+        - accept: bool
+            If True, the file is rehashed and its current checksum
+            replaces the previous one instead of being compared to it.
+
+    Returns:
+        A dictionary with the manifest columns as keys. "Problem"
+        is empty if the file passed every check.
+    '''
+    baseline = previous["SHA-256"] if previous and not accept else ""
+    entry = {"File": path, "Size": "", "Modified": "", "SHA-256": baseline, "Problem": ""}
+    try:
+        stats = os.stat(path)
+    except OSError:
+        entry["Problem"] = "File is missing"
+        return entry
+    entry["Size"] = str(stats.st_size)
+    entry["Modified"] = str(stats.st_mtime_ns)
+    if previous and not accept and previous["Size"] == entry["Size"] and previous["Modified"] == entry["Modified"]:
+        return dict(previous, File=path)
+    problems = []
+    checksum = hashlib.sha256().hexdigest()
+    if stats.st_size == 0:
+        problems.append("File is empty")
+    else:
+        try:
+            with open(path, 'rb') as in_file:
+                with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    checksum = hashlib.sha256(data).hexdigest()
+                    if data[:5] != b"%PDF-":
+                        problems.append("Missing PDF header")
+                    elif data.rfind(b"%%EOF", max(0, len(data) - trailer_size)) == -1:
+                        problems.append("Missing %%EOF trailer, file may be truncated")
+        except (OSError, ValueError):
+            entry["Problem"] = "File could not be read"
+            return entry
+    if baseline and checksum != baseline:
+        problems.insert(0, "Checksum changed")
+    elif not problems:
+        entry["SHA-256"] = checksum
+    entry["Problem"] = "; ".join(problems)
+    return entry
+
+def get_manifest(manifest_path):
+    '''
+    This function reads a manifest written by post_manifest.
+
+    Parameters:
+        - manifest_path: str
+            The path of the manifest.
+
+    Returns:
+        A dictionary of file paths to their manifest entries.
+    '''
+    if not os.path.exists(manifest_path):
+        return dict()
+    with open(manifest_path, 'r', encoding='utf-8', newline='') as in_file:
+        return {entry["File"]: entry for entry in csv.DictReader(in_file)}
+
+def post_manifest(manifest_path, entries):
+    '''
+    This function writes a manifest of checked files.
+
+    Parameters:
+        - manifest_path: str
+            The path of the manifest.
+        - entries: List[dict]
+            The entries returned by verify_file.
+    '''
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as out_file:
+        writer = csv.DictWriter(out_file, fieldnames=manifest_columns)
+        writer.writeheader()
+        writer.writerows(sorted(entries, key=lambda entry: entry["File"]))
+    os.replace(tmp_path, manifest_path)
+
+def verify_files(dest, paths, manifest_path, on_progress=None, accept=False):
+    '''
+    This function checks the given PDFs in parallel with a
+    thread pool, and writes their manifest. Files listed in an
+    existing manifest at the same path are only rehashed if
+    their size or modified time has changed.
+
+    Parameters:
+        - dest: str
+            The output folder the paths are relative to.
+        - paths: List[str]
+            The paths of the PDFs to check, relative to the output
+            folder, so that the manifest stays valid if the output
+            folder is moved.
+        - manifest_path: str
+            The path of the manifest to write.
+        - on_progress: function
+            Called from the calling thread with the number of
+            files checked so far, if provided.
+        - accept: bool
+            If True, every file is rehashed and its current
+            checksum replaces the one in the existing manifest.
+
+    Returns:
+        The list of entries for files that failed a check.
+    '''
+    previous = get_manifest(manifest_path)
+    entries = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(verify_file, os.sep.join([dest, path]), previous.get(path), accept): path for path in paths}
+        for future in as_completed(futures):
+            entries.append(dict(future.result(), File=futures[future]))
+            if on_progress:
+                on_progress(len(entries))
+    post_manifest(manifest_path, entries)
+    return [entry for entry in entries if entry["Problem"]]
+
+def verify_run(dest, latest, run_id, on_progress=None):
+    '''
+    This function checks every PDF in the applicant folders
+    produced by a sort, and writes the run's manifest to the
+    "Manifests" folder of the output folder.
+
+    Parameters:
+        - dest: str
+            The output folder of the sort.
+        - latest: Dict[str, Set[str]]
+            The applicant folders produced by the sort, by hall folder.
+        - run_id: str
+            The name of the manifest, without the extension.
+        - on_progress: function
+            Called with the number of files checked so far.
+
+    Returns:
+        The list of entries for files that failed a check.
+    '''
+    paths = []
+    for hall_dir, applicants in latest.items():
+        for applicant in applicants:
+            applicant_folder = os.sep.join([dest, hall_dir, applicant])
+            if not os.path.isdir(applicant_folder):
+                continue
+            for filename in sorted(os.listdir(applicant_folder)):
+                if filename.endswith(".pdf"):
+                    paths.append(os.sep.join([hall_dir, applicant, filename]))
+    return verify_files(dest, paths, os.sep.join([dest, manifests_name, f"{run_id}.csv"]), on_progress)
+
+def reverify(dest, on_progress=None, accept=False):
+    '''
+    This function checks every file listed in the manifests
+    of an output folder again, rehashing only the files whose
+    size or modified time has changed, and rewrites each manifest.
+    A file whose checksum no longer matches its manifest is
+    reported, and its manifest keeps the original checksum
+    unless accept is True.
+
+    Parameters:
+        - dest: str
+            The output folder containing the "Manifests" folder.
+        - on_progress: function
+            Called with the number of files checked so far in
+            the current manifest.
+        - accept: bool
+            If True, every file is rehashed and its current
+            checksum is kept as the one to check against later.
+
+    Returns:
+        The list of entries for files that failed a check.
+    '''
+    manifests_folder = os.sep.join([dest, manifests_name])
+    if not os.path.isdir(manifests_folder):
+        return []
+    problems = []
+    for manifest_name in sorted(os.listdir(manifests_folder)):
+        if not manifest_name.endswith(".csv"):
+            continue
+        manifest_path = os.sep.join([manifests_folder, manifest_name])
+        problems.extend(verify_files(dest, list(get_manifest(manifest_path)), manifest_path, on_progress, accept))
+    return problems